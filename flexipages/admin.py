@@ -50,7 +50,7 @@ class PageAdmin(admin.ModelAdmin):
             'fields': (('path', 'title'), ('template', 'priority'), 'sites'),
         }),
         (_("Advanced"), {
-            'fields': ('description', 'registration_required', ('cache_timeout', 'enable_client_side_caching'), 'tags'),
+            'fields': ('description', 'registration_required', ('cache_timeout', 'cache_grace_period', 'enable_client_side_caching'), 'tags'),
             'classes': ('collapse',),
         }),
         (_('Information'), {
@@ -1,6 +1,6 @@
 from django import apps as global_apps
 from django.db import router, DEFAULT_DB_ALIAS
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, m2m_changed, post_save, post_delete
 from django.utils import timezone
 
 from flexipages.constants import FLEXIPAGES_EDITOR_GROUP_NAME, FLEXIPAGES_ADMIN_GROUP_NAME, \
@@ -57,6 +57,9 @@ def create_flexipages_default_root_page(verbosity, using=DEFAULT_DB_ALIAS, apps=
         page_item = PageItem.objects.create(publishing_start_date=today,
                                             content="""<h2>Example of Page Item</h2><p>{% lorem %}</p>""", content_rendering_mode=CONTENT_RENDERING_MODE.django_template, use_wysiwyg_editor=False)
         PageItemLayout.objects.create(page=page, item=page_item, priority=100)
+        # Items created with historical models are not indexed on save.
+        from flexipages.search import get_search_backend
+        get_search_backend().index_items(PageItem.objects.filter(pageitemlayout__page=page))
 
 
 class FlexiPagesConfig(global_apps.AppConfig):
@@ -68,6 +71,25 @@ class FlexiPagesConfig(global_apps.AppConfig):
         post_migrate.connect(create_flexipages_admin_groups, sender=self)
         post_migrate.connect(create_flexipages_default_root_page, sender=self)
 
+        # Routing tables depend on the sites on which pages are available.
+        from flexipages.models import Page, refresh_navigation_on_sites_change
+        from flexipages.routing import invalidate_routing_tables_on_sites_change
+        m2m_changed.connect(invalidate_routing_tables_on_sites_change, sender=Page.sites.through)
+        m2m_changed.connect(refresh_navigation_on_sites_change, sender=Page.sites.through)
+
+        # Site registries hold all the sites along with their configuration.
+        from django.contrib.sites.models import Site
+        from flexipages.models import SiteConfiguration
+        from flexipages.sites import invalidate_site_registry_on_change
+        for model in (Site, SiteConfiguration):
+            post_save.connect(invalidate_site_registry_on_change, sender=model)
+            post_delete.connect(invalidate_site_registry_on_change, sender=model)
+
+        # Edition permissions depend on the groups of users.
+        from django.contrib.auth.models import User
+        from flexipages.utils import invalidate_user_groups_on_change
+        m2m_changed.connect(invalidate_user_groups_on_change, sender=User.groups.through)
+
         # @debug
         # from django.conf import settings
         # if settings.DEBUG:
@@ -1,20 +1,103 @@
+import hashlib
+import time
+import uuid
+import zlib
+from urllib.parse import quote
+
 from django.conf import settings
 from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.translation import get_language
+
+from flexipages.purge import purge_surrogate_keys, get_surrogate_key, GLOBAL_SURROGATE_KEY
+
+# Only these headers are kept along with the body of cached pages. Per-request headers such as cookies are dropped.
+CACHED_RESPONSE_HEADERS = ('Content-Type', 'Content-Language', 'Cache-Control', 'Expires', 'Last-Modified', 'ETag', 'Vary',
+                           'X-Robots-Tag')
 
 
 def get_pages_cache():
     return caches[settings.FLEXIPAGES_PAGES_CACHE_ALIAS or 'default']
 
 
-def get_page_cache_keys(page):
-    return [get_page_cache_key_for_device(page, device) for device in ('desktop', 'mobile', 'tablet')]
+def get_generation_cache_key(scope, pk=None):
+    if pk is None:
+        return 'flexipages|generation|%s' % scope
+    return 'flexipages|generation|%s=%s' % (scope, pk)
+
+
+def get_cache_generations(page_pk, template_pk, site_id, page_generation=None):
+    """
+    Get the current generations of the global, site, template and page scopes of the pages cache, as a single string
+    to fold into page cache keys. Generations that are unknown (never set or evicted) are started anew. A page
+    generation may be given in order to build keys for a generation that is not current yet.
+    """
+    page_generation_key = get_generation_cache_key('page', page_pk)
+    generation_keys = [
+        get_generation_cache_key('all'),
+        get_generation_cache_key('site', site_id),
+        get_generation_cache_key('template', template_pk),
+        page_generation_key,
+    ]
+    pages_cache = get_pages_cache()
+    generations = pages_cache.get_many(generation_keys)
+    if page_generation is not None:
+        generations[page_generation_key] = page_generation
+    for key in generation_keys:
+        if key not in generations:
+            generations[key] = start_generation(key)
+    return '.'.join(generations[key] for key in generation_keys)
+
+
+def make_generation():
+    # Random generations (instead of counters) guarantee that entries from an evicted generation never come back.
+    return uuid.uuid4().hex[:12]
+
+
+def start_generation(generation_key):
+    """
+    Start the unknown (never set or evicted) generation with the given key, unless a concurrent request just did: its
+    generation is then kept, so that the entries it cached are not orphaned.
+    @:return the current generation.
+    """
+    pages_cache = get_pages_cache()
+    generation = make_generation()
+    if not pages_cache.add(generation_key, generation, None):
+        generation = pages_cache.get(generation_key) or generation
+    return generation
+
+
+def get_or_add_generation(generation_key):
+    """Get the generation with the given key, which is started anew when unknown (never set or evicted)."""
+    generation = get_pages_cache().get(generation_key)
+    if generation is None:
+        generation = start_generation(generation_key)
+    return generation
+
+
+def bump_cache_generations(generation_keys):
+    """Invalidate at once all the cached pages whose keys include any of the given generations."""
+    get_pages_cache().set_many({key: make_generation() for key in generation_keys}, None)
+
+
+def set_page_generation(page_pk, page_generation):
+    """Make the given generation current for the given page, e.g. once its cache entries are rendered anew."""
+    get_pages_cache().set(get_generation_cache_key('page', page_pk), page_generation, None)
 
 
-def get_page_cache_key_for_device(page, device):
-    return 'flexipages|page=%s|device=%s' % (page.pk, device)
+def get_page_cache_key_for_device(page_pk, template_pk, site_id, path_prefix, device, page_generation=None):
+    generations = get_cache_generations(page_pk=page_pk, template_pk=template_pk, site_id=site_id, page_generation=page_generation)
+    return 'flexipages|page=%s|site=%s|prefix=%s|lang=%s|device=%s|gen=%s' % (
+        page_pk, site_id, quote(path_prefix or ''), get_language(), device, generations)
 
 
-def get_page_cache_key(request, page):
+DEVICES = ('desktop', 'mobile', 'tablet')
+
+
+def get_device_for_request(request):
     # Get device key, so that the response has the proper layout if the user browses the site from his phone and
     # his computer at the same time.
     device = 'desktop'
@@ -23,9 +106,160 @@ def get_page_cache_key(request, page):
             device = 'mobile'
         elif request.user_agent.is_tablet:
             device = 'tablet'
-    return get_page_cache_key_for_device(page, device)
+    return device
+
+
+def get_page_cache_key(request, page_pk, template_pk, path_prefix):
+    from flexipages.sites import get_current_site
+
+    site_id = get_current_site(request).pk
+    return get_page_cache_key_for_device(page_pk, template_pk, site_id, path_prefix, get_device_for_request(request))
 
 
 def delete_cache_for_page(page):
-    pages_cache = get_pages_cache()
-    pages_cache.delete_many(get_page_cache_keys(page))
+    delete_cache_for_pages([page.pk])
+
+
+def delete_cache_for_pages(page_pks):
+    bump_cache_generations([get_generation_cache_key('page', page_pk) for page_pk in page_pks])
+    purge_surrogate_keys([get_surrogate_key('page', page_pk) for page_pk in page_pks])
+
+
+def delete_cache_for_templates(template_pks):
+    bump_cache_generations([get_generation_cache_key('template', template_pk) for template_pk in template_pks])
+    purge_surrogate_keys([get_surrogate_key('template', template_pk) for template_pk in template_pks])
+
+
+def delete_cache_for_site(site):
+    bump_cache_generations([get_generation_cache_key('site', site.pk)])
+    purge_surrogate_keys([get_surrogate_key('site', site.pk)])
+
+
+def delete_cache_for_all_pages():
+    bump_cache_generations([get_generation_cache_key('all')])
+    purge_surrogate_keys([GLOBAL_SURROGATE_KEY])
+
+
+def get_search_results_cache_key(site_id, scope, normalized_search):
+    """
+    The key of the results of a search depends on the site and scope (e.g. anonymous) that the results are available
+    to, on the current search generation, and on the day since items are published by date.
+    """
+    generation = get_or_add_generation(get_generation_cache_key('search'))
+    return 'flexipages|search|site=%s|scope=%s|date=%s|gen=%s|search=%s' % (
+        site_id, scope, timezone.now().date().isoformat(), generation, hashlib.md5(normalized_search.encode('utf-8')).hexdigest())
+
+
+def delete_cache_for_search_results():
+    """Invalidate all the cached search results, e.g. once items, their layouts or pages changed."""
+    bump_cache_generations([get_generation_cache_key('search')])
+
+
+def get_sitemap_cache_key(site_id, protocol, section, page):
+    """The key of a sitemap (or of the sitemap index when section is None) depends on the current sitemap generation."""
+    generation = get_or_add_generation(get_generation_cache_key('sitemap'))
+    return 'flexipages|sitemap|site=%s|protocol=%s|section=%s|page=%s|gen=%s' % (site_id, protocol, section, page, generation)
+
+
+def delete_cache_for_sitemaps():
+    """Invalidate all the cached sitemaps, e.g. once pages are added, moved, updated or deleted."""
+    bump_cache_generations([get_generation_cache_key('sitemap')])
+
+
+def get_page_version_cache_key(page_pk):
+    return 'flexipages|version|page=%s' % page_pk
+
+
+def get_page_version(page_pk):
+    """
+    Get the current version of the given page, which changes whenever the page or anything shown on it changes. Unknown
+    versions (never set or evicted) are started anew.
+    """
+    return get_or_add_generation(get_page_version_cache_key(page_pk))
+
+
+def bump_page_versions(page_pks):
+    """Change the version of the given pages once the ongoing transaction is committed, so that editors get notified."""
+    page_pks = list(page_pks)
+    transaction.on_commit(lambda: get_pages_cache().set_many({get_page_version_cache_key(page_pk): make_generation() for page_pk in page_pks}, None))
+
+
+def get_user_groups_cache_key(user_pk):
+    return 'flexipages|groups|user=%s' % user_pk
+
+
+def delete_cache_for_user_groups(user_pks):
+    get_pages_cache().delete_many([get_user_groups_cache_key(user_pk) for user_pk in user_pks])
+
+
+def make_cache_entry_from_response(response):
+    """
+    Build a compact cache entry out of a rendered response. The entry is a plain tuple holding the status code, the
+    whitelisted headers and the body bytes, which is compressed whenever it is larger than the configured threshold.
+    """
+    header_names = CACHED_RESPONSE_HEADERS + tuple(settings.FLEXIPAGES_SURROGATE_KEY_HEADERS)
+    headers = tuple((header, response[header]) for header in header_names if response.has_header(header))
+    content = response.content
+    threshold = settings.FLEXIPAGES_PAGES_CACHE_COMPRESSION_THRESHOLD
+    is_compressed = threshold is not None and len(content) > threshold
+    if is_compressed:
+        content = zlib.compress(content)
+    return response.status_code, headers, is_compressed, content
+
+
+def make_response_from_cache_entry(entry):
+    status_code, headers, is_compressed, content = entry
+    if is_compressed:
+        content = zlib.decompress(content)
+    headers = dict(headers)
+    response = HttpResponse(content=content, status=status_code, content_type=headers.pop('Content-Type', None))
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def get_cached_response(page_cache_key):
+    """
+    @:return a tuple (response, is_stale) where response is a fresh response built from the pages cache entry with the
+    given key, or None on cache miss. Stale responses are only kept in cache during the grace period of their page.
+    """
+    cached_value = get_pages_cache().get(page_cache_key)
+    if cached_value is None:
+        return None, False
+    fresh_until, entry = cached_value
+    response = make_response_from_cache_entry(entry)
+    # Browsers and shared caches may only keep the response for as long as it remains fresh in the pages cache.
+    remaining_seconds = max(0, int(fresh_until - time.time()))
+    cache_control = response.get('Cache-Control', '')
+    if 'max-age' in cache_control:
+        patch_cache_control(response, max_age=remaining_seconds)
+    if 's-maxage' in cache_control:
+        patch_cache_control(response, s_maxage=remaining_seconds)
+    return response, time.time() > fresh_until
+
+
+def set_cached_response(page_cache_key, response, timeout, grace_period=0):
+    cached_value = (time.time() + timeout, make_cache_entry_from_response(response))
+    get_pages_cache().set(page_cache_key, cached_value, timeout + grace_period)
+
+
+def get_page_rendering_lock_key(page_cache_key):
+    return '%s|lock' % page_cache_key
+
+
+def acquire_page_rendering_lock(page_cache_key):
+    """
+    Try to become the only request rendering the page cached under the given key.
+    @:return True if the lock was acquired, False if another request is already rendering the page.
+    """
+    lock_key = get_page_rendering_lock_key(page_cache_key)
+    return get_pages_cache().add(lock_key, True, settings.FLEXIPAGES_PAGE_RENDERING_LOCK_TIMEOUT)
+
+
+def release_page_rendering_lock(page_cache_key):
+    get_pages_cache().delete(get_page_rendering_lock_key(page_cache_key))
+
+
+def is_page_rendering_locked(page_cache_key):
+    return get_pages_cache().get(get_page_rendering_lock_key(page_cache_key)) is not None
+
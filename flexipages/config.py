@@ -1,6 +1,44 @@
 from djangocodemirror.settings import *
 
 FLEXIPAGES_PAGES_CACHE_ALIAS = None
+# Maximum number of compiled templates of items kept in memory by each process.
+FLEXIPAGES_ITEM_RENDERERS_CACHE_SIZE = 1000
+# Size in bytes above which the body of cached pages is compressed (None disables compression).
+FLEXIPAGES_PAGES_CACHE_COMPRESSION_THRESHOLD = 4096
+# For pages with a cache grace period: maximum duration in seconds of the rendering of a page by a single request.
+FLEXIPAGES_PAGE_RENDERING_LOCK_TIMEOUT = 30
+# Re-render changed pages in background threads, instead of simply invalidating their cache.
+FLEXIPAGES_RERENDER_PAGES_ON_SAVE = False
+FLEXIPAGES_RERENDER_WORKERS = 2
+# Let a reverse proxy or CDN cache public pages: responses get s-maxage and surrogate keys (page, site, template, items
+# and tags) in the given headers, and the purge backend (if any) invalidates them whenever the pages cache is.
+FLEXIPAGES_SHARED_CACHING = False
+FLEXIPAGES_SURROGATE_KEY_HEADERS = ('Surrogate-Key',)
+FLEXIPAGES_PURGE_BACKEND = None  # E.g. 'flexipages.purge.HttpPurgeBackend'
+FLEXIPAGES_PURGE_URL = None
+FLEXIPAGES_PURGE_TIMEOUT = 5
+# Duration in seconds of the cache of rendered items and zones, used to assemble pages that are not served from the
+# pages cache, e.g. filtered by tag or without caching (None disables fragments caching).
+FLEXIPAGES_FRAGMENTS_CACHE_TIMEOUT = None
+# Backend used for searching the contents of items, e.g. 'flexipages.search.PostgresSearchBackend' along with the text
+# search configuration of PostgreSQL.
+FLEXIPAGES_SEARCH_BACKEND = 'flexipages.search.InvertedIndexSearchBackend'
+FLEXIPAGES_POSTGRES_SEARCH_CONFIG = 'simple'
+# Number of search results per page, and maximum number of results of a search.
+FLEXIPAGES_SEARCH_RESULTS_PER_PAGE = 20
+FLEXIPAGES_SEARCH_MAX_RESULTS = 1000
+# Duration in seconds of the cache of search results on the server side (invalidated whenever items, their layouts or
+# pages change), and of the cache of search results sent with GET in browsers.
+FLEXIPAGES_SEARCH_CACHE_TIMEOUT = 3600
+FLEXIPAGES_SEARCH_RESULTS_MAX_AGE = 60
+# Duration in seconds of the cache of the FlexiPages groups of users (changes of memberships invalidate it at once).
+FLEXIPAGES_USER_GROUPS_CACHE_TIMEOUT = 300
+# Editors check for updates of the page they view at the given interval in seconds (at most 2), with tokens expiring
+# after the given age (expired tokens are renewed as long as the editor is still logged in).
+FLEXIPAGES_PAGE_UPDATE_POLL_INTERVAL = 1
+FLEXIPAGES_PAGE_UPDATE_TOKEN_MAX_AGE = 3600 * 12
+# Duration in seconds of the cache of the sitemaps (invalidated whenever pages change), None disables their caching.
+FLEXIPAGES_SITEMAP_CACHE_TIMEOUT = 3600 * 24
 
 FLEXIPAGES_REQUIRED_APPS = [
     'django.contrib.admin',
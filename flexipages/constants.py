@@ -3,9 +3,14 @@ from collections import namedtuple
 FLEXIPAGES_EDITOR_GROUP_NAME = 'FlexiPages Editor'
 FLEXIPAGES_ADMIN_GROUP_NAME = 'FlexiPages Administrator'
 FLEXIPAGES_SITE_DESIGNER_GROUP_NAME = 'FlexiPages Site Designer'
+FLEXIPAGES_GROUP_NAMES = (FLEXIPAGES_EDITOR_GROUP_NAME, FLEXIPAGES_ADMIN_GROUP_NAME, FLEXIPAGES_SITE_DESIGNER_GROUP_NAME)
 
 IS_EDITING_ATTRIBUTE_NAME = 'is_editing'
 EDITION_CONTEXT_ATTRIBUTE_NAME = 'edition_context'
+PAGE_UPDATE_TOKEN_SALT = 'flexipages.page_update'
+PAGE_UPDATE_TOKEN_HEADER = 'X-Page-Update-Token'
+# Editors used to check for page updates every 2 seconds: polling never gets slower than that.
+MAX_PAGE_UPDATE_POLL_INTERVAL = 2
 
 SEMANTIC_UI_CSS_URL = "https://cdn.jsdelivr.net/npm/semantic-ui@2.4.2/dist/semantic.min.css"
 
@@ -13,4 +18,13 @@ PAGE_CACHE_DURATIONS = namedtuple("PAGE_CACHE_DURATIONS", "none one_minute five_
 
 CONTENT_RENDERING_MODE = namedtuple("CONTENT_RENDERING_MODE", "html django_template markdown json javascript")._make(range(1, 6))
 
+# Rendering modes whose output depends on the content only, and is therefore stored along with the item.
+PRE_RENDERED_CONTENT_RENDERING_MODES = (CONTENT_RENDERING_MODE.markdown, CONTENT_RENDERING_MODE.json)
+
+MARKDOWN_EXTRAS = ("header-ids", "tables", "fenced-code-blocks")
+
+# Increase whenever the output of pre-rendered modes changes, so that stored outputs get rendered anew.
+CONTENT_RENDERER_VERSION = 1
+
 SEARCH_RESULTS_PATH = 'search/'
+AJAX_SEARCH_RESULTS_PATH = 'ajax/search/'
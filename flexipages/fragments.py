@@ -0,0 +1,87 @@
+import hashlib
+
+from django.conf import settings
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from flexipages.cache import get_pages_cache
+from flexipages.constants import CONTENT_RENDERING_MODE
+
+# Names of the item attributes holding its cached rendering (set before rendering the page, along with a flag telling
+# whether it comes from the cached zone), and its fresh rendering (set when the item is rendered).
+CACHED_FRAGMENT_ATTRIBUTE_NAME = 'cached_fragment'
+IS_ZONE_CACHED_ATTRIBUTE_NAME = 'is_zone_cached'
+RENDERED_FRAGMENT_ATTRIBUTE_NAME = 'rendered_fragment'
+
+
+def is_fragment_caching_enabled(edition_context):
+    return bool(settings.FLEXIPAGES_FRAGMENTS_CACHE_TIMEOUT) and not edition_context['is_editing']
+
+
+def get_item_fragment_cache_key(page, item):
+    """
+    Items rendered as Django templates have access to the page (which is updated along with its layouts and items) and
+    to their position in their zone, which changes when filtering items by tag: both are part of their key.
+    """
+    context = ''
+    if item.content_rendering_mode == CONTENT_RENDERING_MODE.django_template:
+        previous_item = getattr(item, 'previous_item', None)
+        next_item = getattr(item, 'next_item', None)
+        context = '|page_updated=%s|position=%s/%s|previous=%s|next=%s' % (
+            page.last_updated.timestamp(), getattr(item, 'item_index', None), getattr(item, 'item_count', None),
+            previous_item.pk if previous_item else None, next_item.pk if next_item else None)
+    return 'flexipages|fragment|item=%s|updated=%s|mode=%s|page=%s|lang=%s%s' % (
+        item.pk, item.last_updated.timestamp(), item.content_rendering_mode, page.pk, get_language(), context)
+
+
+def get_zone_fragment_cache_key(page, zone_name, items):
+    """
+    The key of a zone depends on the last update of the page and on its layout signature, i.e. the ordered items of the
+    zone and their last update.
+    """
+    signature = '|'.join('%s:%s:%s' % (item.pk, item.last_updated.timestamp(), item.content_rendering_mode) for item in items)
+    return 'flexipages|fragment|page=%s|updated=%s|zone=%s|lang=%s|layout=%s' % (
+        page.pk, page.last_updated.timestamp(), zone_name, get_language(), hashlib.md5(signature.encode('utf-8')).hexdigest())
+
+
+def attach_cached_fragments(page, items_by_zone):
+    """
+    Attach their cached rendering to the items of the given zones, if any. Zones are looked up first, so that
+    unchanged zones are fetched at once; the items of the other zones (e.g. filtered by tag) are looked up one by one.
+    """
+    pages_cache = get_pages_cache()
+    zone_keys = {get_zone_fragment_cache_key(page, zone_name, items): zone_name for zone_name, items in items_by_zone.items()}
+    cached_zones = pages_cache.get_many(zone_keys.keys())
+    items_to_lookup = dict()
+    for zone_key, zone_name in zone_keys.items():
+        cached_zone = cached_zones.get(zone_key)
+        for item in items_by_zone[zone_name]:
+            if cached_zone is not None and item.pk in cached_zone:
+                setattr(item, CACHED_FRAGMENT_ATTRIBUTE_NAME, mark_safe(cached_zone[item.pk]))
+                setattr(item, IS_ZONE_CACHED_ATTRIBUTE_NAME, True)
+            else:
+                items_to_lookup[get_item_fragment_cache_key(page, item)] = item
+    if items_to_lookup:
+        for item_key, fragment in pages_cache.get_many(items_to_lookup.keys()).items():
+            setattr(items_to_lookup[item_key], CACHED_FRAGMENT_ATTRIBUTE_NAME, mark_safe(fragment))
+
+
+def cache_rendered_fragments(page, items_by_zone):
+    """Store the items rendered with the page, as well as the zones whose items are all rendered (or were cached)."""
+    fragments = dict()
+    for zone_name, items in items_by_zone.items():
+        zone_fragments = dict()
+        for item in items:
+            fragment = getattr(item, RENDERED_FRAGMENT_ATTRIBUTE_NAME, None)
+            if fragment is not None:
+                fragments[get_item_fragment_cache_key(page, item)] = str(fragment)
+            else:
+                fragment = getattr(item, CACHED_FRAGMENT_ATTRIBUTE_NAME, None)
+            if fragment is not None:
+                zone_fragments[item.pk] = str(fragment)
+        # Zones are not stored when some of their items are not rendered by the page template.
+        is_zone_cached = all(getattr(item, IS_ZONE_CACHED_ATTRIBUTE_NAME, False) for item in items)
+        if not is_zone_cached and len(zone_fragments) == len(items):
+            fragments[get_zone_fragment_cache_key(page, zone_name, items)] = zone_fragments
+    if fragments:
+        get_pages_cache().set_many(fragments, settings.FLEXIPAGES_FRAGMENTS_CACHE_TIMEOUT)
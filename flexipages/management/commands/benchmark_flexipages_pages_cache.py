@@ -0,0 +1,48 @@
+import pickle
+import timeit
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from flexipages.cache import get_pages_cache, make_cache_entry_from_response, make_response_from_cache_entry
+from flexipages.models import Page
+from flexipages.views import create_rendered_page, get_edition_context
+
+
+class Command(BaseCommand):
+    help = "Compare the size and the hit latency of cached pages stored as pickled responses against compact cache entries."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/', help="The path of the page to render (default: '/').")
+        parser.add_argument('--iterations', type=int, default=1000, help="The number of cache hits to time for each format.")
+
+    def handle(self, *args, **options):
+        page = Page.objects.filter(path=options['path']).first()
+        if page is None:
+            raise CommandError("No page found with path '%s'." % options['path'])
+        iterations = options['iterations']
+
+        request = RequestFactory().get(page.path)
+        request.user = AnonymousUser()
+        response = create_rendered_page(request, page, get_edition_context(request))
+        with override_settings(FLEXIPAGES_PAGES_CACHE_COMPRESSION_THRESHOLD=None):
+            uncompressed_entry = make_cache_entry_from_response(response)
+        with override_settings(FLEXIPAGES_PAGES_CACHE_COMPRESSION_THRESHOLD=0):
+            compressed_entry = make_cache_entry_from_response(response)
+
+        variants = (
+            ("pickled response", response, lambda value: value),
+            ("cache entry", uncompressed_entry, make_response_from_cache_entry),
+            ("compressed cache entry", compressed_entry, make_response_from_cache_entry),
+        )
+        pages_cache = get_pages_cache()
+        cache_key = 'flexipages|benchmark|page=%s' % page.pk
+        self.stdout.write("Page '%s' (%i bytes of content), %i hits per format:" % (page.path, len(response.content), iterations))
+        for label, value, make_response in variants:
+            size = len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            pages_cache.set(cache_key, value)
+            duration = timeit.timeit(lambda: make_response(pages_cache.get(cache_key)), number=iterations)
+            self.stdout.write("  %-24s %8i bytes  %8.1f µs/hit" % (label, size, duration * 1e6 / iterations))
+        pages_cache.delete(cache_key)
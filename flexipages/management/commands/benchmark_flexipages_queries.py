@@ -0,0 +1,75 @@
+import datetime
+import random
+import timeit
+
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from flexipages.models import Page, PageItem, PageItemLayout, PageTemplate
+from flexipages.utils import get_default_base_template_for_page
+
+ZONE_NAMES = ('', 'sidebar', 'footer')
+
+
+class Command(BaseCommand):
+    help = "Print the query plans and timings of the queries of the page rendering hot path, on a generated dataset that is rolled back afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100000, help="The number of generated items (default: 100000).")
+        parser.add_argument('--pages', type=int, default=1000, help="The number of generated pages showing these items (default: 1000).")
+        parser.add_argument('--iterations', type=int, default=20, help="The number of runs to time for each query (default: 20).")
+
+    def handle(self, *args, **options):
+        template = get_default_base_template_for_page(PageTemplate)
+        if template is None:
+            raise CommandError("The default base template of pages is missing, please run migrations first.")
+        site = Site.objects.get_current()
+        with transaction.atomic():
+            pages = self.generate_dataset(site, template, options['items'], options['pages'])
+            page = pages[len(pages) // 2]
+            today = timezone.now().date()
+            queries = (
+                ("layouts of a page", PageItemLayout.objects.get_layouts_for_page(page)),
+                ("published items of a page", PageItem.objects.get_items_for_page(page)),
+                ("next publishing start of a page", PageItem.objects.filter(pageitemlayout__page=page, publishing_start_date__gt=today).order_by('publishing_start_date')[:1]),
+                ("page by path and site", Page.objects.filter(sites=site, path=page.path)),
+                ("routing table of a site", Page.objects.filter(sites=site).values_list('pk', 'path', 'registration_required', 'cache_timeout', 'template_id', 'template__name', 'title', 'priority')),
+            )
+            for label, queryset in queries:
+                self.stdout.write(self.style.MIGRATE_HEADING(label))
+                self.stdout.write(queryset.explain())
+                duration = timeit.timeit(lambda: list(queryset.all()), number=options['iterations'])
+                self.stdout.write("%.2f ms/query\n" % (duration * 1e3 / options['iterations']))
+            # Nothing generated is kept.
+            transaction.set_rollback(True)
+
+    def generate_dataset(self, site, template, item_count, page_count):
+        """Create the given number of pages and items (most of them published), spread over the zones of the pages."""
+        self.stdout.write("Generating %i item(s) on %i page(s)..." % (item_count, page_count))
+        run_id = random.randrange(1 << 30)
+        pages = Page.objects.bulk_create([Page(path='/benchmark-%i/%i/' % (run_id, i), title='Page %i' % i, template=template, level=2) for i in range(page_count)])
+        if not pages[0].pk:
+            pages = list(Page.objects.filter(path__startswith='/benchmark-%i/' % run_id))
+        Page.sites.through.objects.bulk_create([Page.sites.through(page_id=page.pk, site_id=site.pk) for page in pages])
+
+        today = timezone.now().date()
+        items = []
+        for i in range(item_count):
+            start_date = today + datetime.timedelta(days=random.randint(-365, 30)) if random.random() < 0.9 else None
+            end_date = start_date + datetime.timedelta(days=random.randint(1, 365)) if start_date and random.random() < 0.3 else None
+            items.append(PageItem(content='<p>Item %i</p>' % i, publishing_start_date=start_date, publishing_end_date=end_date))
+        PageItem.objects.bulk_create(items)
+        if not items[0].pk:
+            items = list(PageItem.objects.order_by('-pk')[:item_count])
+        PageItemLayout.objects.bulk_create([
+            PageItemLayout(page=pages[i % page_count], item=item, zone_name=random.choice(ZONE_NAMES), priority=random.choice((None, i % 100)))
+            for i, item in enumerate(items)
+        ])
+
+        # Let the query planner know about the generated data.
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        return pages
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from flexipages.cache import delete_cache_for_pages
+from flexipages.models import Page
+from flexipages.routing import invalidate_routing_tables
+
+
+class Command(BaseCommand):
+    help = "Rebuild the parent and level of pages from their paths, in bulk (e.g. after importing pages)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--site', action='append', dest='sites', metavar='DOMAIN', help="Only rebuild pages of the site with the given domain (may be repeated).")
+        parser.add_argument('--batch-size', type=int, default=1000, help="The number of pages updated at once (default: 1000).")
+
+    def handle(self, *args, **options):
+        # Parents are looked up among all pages, whatever their sites, like when saving pages.
+        pks_by_path = dict()
+        for page_pk, path in Page.objects.order_by('pk').values_list('pk', 'path').iterator():
+            pks_by_path.setdefault(path.strip('/'), page_pk)
+
+        pages = Page.objects.only('pk', 'path', 'parent', 'level')
+        if options['sites']:
+            pages = pages.filter(sites__domain__in=options['sites']).distinct()
+        pages_to_update = []
+        for page in pages.iterator():
+            parent_pk = next((pks_by_path[path] for path in Page.get_ancestor_paths(page.path) if path in pks_by_path), None)
+            level = Page.get_level_from_path(page.path)
+            if page.parent_id != parent_pk or page.level != level:
+                page.parent_id = parent_pk
+                page.level = level
+                pages_to_update.append(page)
+
+        if pages_to_update:
+            Page.objects.bulk_update(pages_to_update, ['parent', 'level'], batch_size=options['batch_size'])
+            delete_cache_for_pages([page.pk for page in pages_to_update])
+            invalidate_routing_tables()
+        self.stdout.write(self.style.SUCCESS("%i page(s) updated." % len(pages_to_update)))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from flexipages.models import PageItem
+from flexipages.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Index the title and content of all items anew with the search backend."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="The number of items indexed at once (default: 500).")
+
+    def handle(self, *args, **options):
+        search_backend = get_search_backend()
+        items = PageItem.objects.only('pk', 'title', 'content').order_by('pk')
+        batch = []
+        count = 0
+        for item in items.iterator():
+            batch.append(item)
+            if len(batch) >= options['batch_size']:
+                search_backend.index_items(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            search_backend.index_items(batch)
+            count += len(batch)
+        self.stdout.write(self.style.SUCCESS("%i item(s) indexed." % count))
@@ -0,0 +1,38 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from flexipages.cache import DEVICES
+from flexipages.constants import PAGE_CACHE_DURATIONS
+from flexipages.models import Page, PageItem
+from flexipages.warming import warm_page_cache
+
+
+class Command(BaseCommand):
+    help = "Refresh the pages showing items that got published or unpublished lately, e.g. daily right after midnight."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1, help="The number of past days whose publishing transitions are handled, today included (default: 1).")
+        parser.add_argument('--warm', action='store_true', help="Render the refreshed pages into the pages cache, for each of their sites and each device variant.")
+
+    def handle(self, *args, **options):
+        today = timezone.now().date()
+        first_day = today - datetime.timedelta(days=options['days'] - 1)
+        # Items get published on their start date, and unpublished the day after their end date.
+        items = PageItem.objects.filter(
+            Q(publishing_start_date__gte=first_day, publishing_start_date__lte=today) |
+            Q(publishing_end_date__gte=first_day - datetime.timedelta(days=1), publishing_end_date__lt=today)
+        )
+        # Syncing the last update of pages also changes their validators, so that browsers do not keep them.
+        page_pks = items.sync_related_pages()
+        self.stdout.write("%i page(s) refreshed." % len(page_pks))
+
+        if options['warm']:
+            pages = Page.objects.filter(pk__in=page_pks).exclude(cache_timeout=PAGE_CACHE_DURATIONS.none).prefetch_related('sites')
+            for page in pages:
+                for site in page.sites.all():
+                    warm_page_cache(page.pk, site.pk, DEVICES)
+                    self.stdout.write("%s%s" % (site.domain, page.path))
+        self.stdout.write(self.style.SUCCESS("Publishing transitions handled from %s to %s." % (first_day, today)))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from flexipages.constants import PRE_RENDERED_CONTENT_RENDERING_MODES
+from flexipages.models import PageItem
+
+
+class Command(BaseCommand):
+    help = "Render anew the stored output of items that only depends on their content (e.g. Markdown or JSON) when the renderer changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Render all items anew, even those whose stored output is up to date.")
+        parser.add_argument('--batch-size', type=int, default=500, help="The number of items updated at once (default: 500).")
+
+    def handle(self, *args, **options):
+        items = PageItem.objects.filter(content_rendering_mode__in=PRE_RENDERED_CONTENT_RENDERING_MODES).only('pk', 'content', 'content_rendering_mode', 'renderer_version')
+        items_to_update = []
+        updated_count = 0
+        for item in items.iterator():
+            if options['all'] or not item.has_up_to_date_rendered_content():
+                item.update_rendered_content()
+                items_to_update.append(item)
+            if len(items_to_update) >= options['batch_size']:
+                updated_count += self.update_items(items_to_update)
+        updated_count += self.update_items(items_to_update)
+        self.stdout.write(self.style.SUCCESS("%i item(s) rendered anew." % updated_count))
+
+    @staticmethod
+    def update_items(items):
+        """Store the rendered content of the given items, and sync the pages showing them. @:return the item count."""
+        count = len(items)
+        if items:
+            PageItem.objects.bulk_update(items, ['rendered_content', 'renderer_version'])
+            items.clear()
+        return count
@@ -0,0 +1,40 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from flexipages.cache import DEVICES
+from flexipages.constants import PAGE_CACHE_DURATIONS
+from flexipages.models import Page
+from flexipages.warming import warm_page_cache
+
+
+class Command(BaseCommand):
+    help = "Render every cacheable page into the pages cache, for each of its sites and each device variant."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--site', action='append', dest='sites', metavar='DOMAIN', help="Only warm pages of the site with the given domain (may be repeated).")
+        parser.add_argument('--device', action='append', dest='devices', choices=DEVICES, help="Only warm the given device variant (may be repeated).")
+        parser.add_argument('--workers', type=int, default=4, help="The number of pages rendered concurrently (default: 4).")
+        parser.add_argument('--processes', action='store_true', help="Render pages in a process pool instead of a thread pool.")
+
+    def handle(self, *args, **options):
+        devices = tuple(options['devices'] or DEVICES)
+        pages = Page.objects.exclude(cache_timeout=PAGE_CACHE_DURATIONS.none).prefetch_related('sites')
+        tasks = []
+        for page in pages:
+            for site in page.sites.all():
+                if not options['sites'] or site.domain in options['sites']:
+                    tasks.append((page.pk, site.pk, site.domain))
+
+        if options['processes']:
+            # Forked processes must not share the database connections of this process.
+            connections.close_all()
+            executor_class = ProcessPoolExecutor
+        else:
+            executor_class = ThreadPoolExecutor
+        with executor_class(max_workers=options['workers']) as executor:
+            futures = [(domain, executor.submit(warm_page_cache, page_pk, site_pk, devices)) for page_pk, site_pk, domain in tasks]
+            for domain, future in futures:
+                self.stdout.write("%s%s" % (domain, future.result()))
+        self.stdout.write(self.style.SUCCESS("%i page(s) rendered for %i device variant(s)." % (len(tasks), len(devices))))
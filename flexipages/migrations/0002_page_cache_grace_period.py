@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flexipages', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='cache_grace_period',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'no grace period'), (1, '1 minute'), (2, '5 minutes'), (3, '15 minutes'), (4, '30 minutes'), (5, '1 hour'), (6, '3 hours'), (7, '6 hours'), (8, '12 hours'), (9, '1 day'), (10, '3 days'), (11, '1 week'), (12, '2 weeks'), (13, '1 month')], default=0, help_text='Indicates for how long an expired page may still be served from the server side cache while a single request refreshes it. Concurrent requests for this page are then rendered only once.', verbose_name='page cache grace period'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flexipages', '0002_page_cache_grace_period'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pageitem',
+            name='rendered_content',
+            field=models.TextField(blank=True, default='', editable=False, help_text='The output of the content, stored for rendering modes that only depend on the content.', verbose_name='rendered content'),
+        ),
+        migrations.AddField(
+            model_name='pageitem',
+            name='renderer_version',
+            field=models.CharField(blank=True, default='', editable=False, help_text='The version of the renderer that produced the rendered content.', max_length=32, verbose_name='renderer version'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from flexipages.search import get_weighted_terms
+
+
+def index_existing_items(apps, schema_editor):
+    PageItem = apps.get_model('flexipages', 'PageItem')
+    SearchIndexEntry = apps.get_model('flexipages', 'SearchIndexEntry')
+    entries = []
+    for item in PageItem.objects.only('pk', 'title', 'content').order_by('pk').iterator():
+        entries += [SearchIndexEntry(item_id=item.pk, term=term, weight=weight) for term, weight in get_weighted_terms(item.title, item.content).items()]
+        if len(entries) >= 5000:
+            SearchIndexEntry.objects.bulk_create(entries)
+            entries = []
+    SearchIndexEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flexipages', '0003_pageitem_rendered_content'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchIndexEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='term')),
+                ('weight', models.PositiveIntegerField(default=1, verbose_name='weight')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_index_entries', to='flexipages.PageItem', verbose_name='item')),
+            ],
+            options={
+                'verbose_name': 'search index entry',
+                'verbose_name_plural': 'search index entries',
+                'unique_together': {('term', 'item')},
+            },
+        ),
+        migrations.RunPython(index_existing_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flexipages', '0004_search_index_entry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pageitem',
+            index=models.Index(condition=models.Q(publishing_start_date__isnull=False), fields=['publishing_start_date', 'publishing_end_date'], name='flexipages_item_publishing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pageitemlayout',
+            index=models.Index(fields=['page', 'zone_name', 'priority'], name='flexipages_layout_order_idx'),
+        ),
+    ]
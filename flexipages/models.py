@@ -1,4 +1,7 @@
+import datetime
+import hashlib
 import json
+import math
 from json import JSONDecodeError
 
 import markdown2
@@ -6,10 +9,10 @@ from dbtemplates import models as dbtemplates_models
 from dbtemplates.utils.cache import remove_cached_template
 from django.contrib.auth.models import User
 from django.contrib.sites.models import Site
-from django.contrib.sites.shortcuts import get_current_site
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import Q, Min
 from django.template import engines
 from django.template.defaultfilters import striptags, truncatewords_html
 from django.urls import get_script_prefix
@@ -19,10 +22,20 @@ from django.utils.html import format_html, json_script
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _, ugettext
 
-from stringrenderer import StringTemplateRenderer, check_template_syntax
-from flexipages.cache import delete_cache_for_page
+from stringrenderer import check_template_syntax
+from flexipages.cache import delete_cache_for_page, delete_cache_for_templates, delete_cache_for_site, \
+    delete_cache_for_search_results, delete_cache_for_sitemaps
+from flexipages.purge import purge_surrogate_keys, get_surrogate_key
+from flexipages.renderers import item_renderers_cache
+from flexipages.routing import invalidate_routing_tables, get_routing_table
+from flexipages.search import get_search_backend
+from flexipages.sites import get_current_site, invalidate_site_registry
+from flexipages.fragments import CACHED_FRAGMENT_ATTRIBUTE_NAME, RENDERED_FRAGMENT_ATTRIBUTE_NAME
+from flexipages.template_dependencies import get_dependent_template_names
+from flexipages.warming import refresh_cache_for_pages
 from flexipages.constants import EDITION_CONTEXT_ATTRIBUTE_NAME, PAGE_CACHE_DURATIONS, IS_EDITING_ATTRIBUTE_NAME, \
-    CONTENT_RENDERING_MODE, SEARCH_RESULTS_PATH
+    CONTENT_RENDERING_MODE, SEARCH_RESULTS_PATH, PRE_RENDERED_CONTENT_RENDERING_MODES, MARKDOWN_EXTRAS, \
+    CONTENT_RENDERER_VERSION
 
 PAGE_CACHE_DURATIONS_CHOICES = (
     (PAGE_CACHE_DURATIONS.none, _("no caching")),
@@ -41,6 +54,8 @@ PAGE_CACHE_DURATIONS_CHOICES = (
     (PAGE_CACHE_DURATIONS.one_month, _("1 month")),
 )
 
+PAGE_CACHE_GRACE_PERIOD_CHOICES = ((PAGE_CACHE_DURATIONS.none, _("no grace period")),) + PAGE_CACHE_DURATIONS_CHOICES[1:]
+
 
 class PageTemplate(dbtemplates_models.Template):
     verbose_name = _('page template')
@@ -58,12 +73,26 @@ class PageTemplate(dbtemplates_models.Template):
                 ))
 
     def save(self, *args, **kwargs):
+        # Templates that extend or include this template by its previous name depend on it as well.
+        previous_name = PageTemplate.objects.filter(pk=self.pk).values_list('name', flat=True).first() if self.pk else None
         super().save(*args, **kwargs)
         # Invalidate cache.
         remove_cached_template(self)
-        # Any page using this template is considered as updated.
-        # NB: in case of interconnected templates via extend and include directives, the pages are not refreshed.
-        Page.objects.filter(template=self).update(last_updated=timezone.now())
+        template_names = get_dependent_template_names(self.name)
+        if previous_name is not None and previous_name != self.name:
+            remove_cached_template(PageTemplate(name=previous_name))
+            template_names |= get_dependent_template_names(previous_name)
+        # Any page using this template, or a template that extends or includes it (transitively), is considered as
+        # updated.
+        template_pks = list(PageTemplate.objects.filter(name__in=template_names).values_list('pk', flat=True))
+        delete_cache_for_templates(template_pks)
+        pages = Page.objects.filter(template__in=template_pks)
+        page_pks = list(pages.values_list('pk', flat=True))
+        pages.update(last_updated=timezone.now())
+        refresh_cache_for_pages(page_pks)
+        delete_cache_for_sitemaps()
+        # Site registries hold the search results templates of sites.
+        invalidate_site_registry()
 
     class Meta:
         proxy = True
@@ -90,6 +119,17 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Pages list the tags of their items.
+        PageItem.objects.filter(tags=self).sync_related_pages()
+        purge_surrogate_keys([get_surrogate_key('tag', self.pk)])
+
+    def delete(self, *args, **kwargs):
+        PageItem.objects.filter(tags=self).sync_related_pages()
+        purge_surrogate_keys([get_surrogate_key('tag', self.pk)])
+        return super().delete(*args, **kwargs)
+
     class Meta:
         verbose_name = _('tag')
         verbose_name_plural = _('tags')
@@ -104,6 +144,7 @@ class Page(models.Model):
     sites = models.ManyToManyField(Site, verbose_name=_('sites'), help_text=_("The sites on which the URL of this page must be available."))
     registration_required = models.BooleanField(_('registration required'), help_text=_("If this is checked, only logged-in users will be able to view the page."), default=False,)
     cache_timeout = models.PositiveSmallIntegerField(_('page cache timeout'), default=PAGE_CACHE_DURATIONS.one_hour, choices=PAGE_CACHE_DURATIONS_CHOICES, help_text=_("Indicates for how long the page is cached on the server side."))
+    cache_grace_period = models.PositiveSmallIntegerField(_('page cache grace period'), default=PAGE_CACHE_DURATIONS.none, choices=PAGE_CACHE_GRACE_PERIOD_CHOICES, help_text=_("Indicates for how long an expired page may still be served from the server side cache while a single request refreshes it. Concurrent requests for this page are then rendered only once."))
     enable_client_side_caching = models.BooleanField(_('enable client side caching'), default=True, help_text=_("Tells whether the client's browser is allowed to keep this page in cache. When enabled, the user needs to fully refresh the page in his web browser for obtaining the latest version."))
     description = models.CharField(_('description'), blank=True, max_length=256, help_text=_('A description of this page.'))
     tags = models.ManyToManyField(Tag, verbose_name=_('tags'), blank=True)
@@ -125,13 +166,60 @@ class Page(models.Model):
                 ))
 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Keep track of the saved path, so that the page tree is only updated when pages are added or moved.
+        instance._saved_path = values[field_names.index('path')] if 'path' in field_names else None
+        return instance
+
     def save(self, *args, **kwargs):
-        # Adjust page level according to path.
-        self.level = self.path.strip('/').count('/')
-        self.parent = self.search_parent_from_path(self.level, self.path)
+        update_fields = kwargs.get('update_fields')
+        is_moved = self.path != getattr(self, '_saved_path', None) and (update_fields is None or 'path' in update_fields)
+        if is_moved:
+            # Adjust page level and parent according to path.
+            previous_parent_id = self.parent_id
+            self.level = self.get_level_from_path(self.path)
+            self.parent = self.search_parent_from_path(self.path, exclude_pk=self.pk)
         super().save(*args, **kwargs)
+        saved_path = getattr(self, '_saved_path', None)
+        if is_moved:
+            self.reparent_subtree(previous_parent_id)
+            self._saved_path = self.path
+        # Invalidate (or re-render) cache.
+        refresh_cache_for_pages([self.pk])
+        delete_cache_for_sitemaps()
+        # Saving the last update only (e.g. from layouts) does not affect routing.
+        if update_fields is None or set(update_fields) != {'last_updated'}:
+            self.refresh_cache_for_navigation([path for path in (saved_path, self.path) if path is not None])
+            invalidate_routing_tables()
+            delete_cache_for_search_results()
+
+    def delete(self, *args, **kwargs):
         # Invalidate cache.
         delete_cache_for_page(self)
+        self.refresh_cache_for_navigation([self.path])
+        invalidate_routing_tables()
+        delete_cache_for_search_results()
+        delete_cache_for_sitemaps()
+        # Children of the page are linked to its own parent, i.e. their closest ancestor once the page is deleted.
+        Page.objects.filter(parent=self).update(parent=self.search_parent_from_path(self.path, exclude_pk=self.pk))
+        return super().delete(*args, **kwargs)
+
+    def refresh_cache_for_navigation(self, paths, sites=None):
+        """
+        Refresh the cache of the pages whose navigation menus show this page at any of the given paths (e.g. before and
+        after moving it), on the given sites or on the sites of the page. Routing tables are still the ones from before
+        the change, since they are only rebuilt once the change is committed.
+        """
+        page_pks = set()
+        for site in self.sites.all() if sites is None else sites:
+            navigation = get_routing_table(site).navigation
+            for path in paths:
+                page_pks.update(navigation.get_page_pks_showing_path(path))
+        page_pks.discard(self.pk)
+        if page_pks:
+            refresh_cache_for_pages(page_pks)
 
     def get_absolute_url(self):
         """
@@ -151,50 +239,105 @@ class Page(models.Model):
         return Page.objects.filter(parent=self).exclude(priority__isnull=True)
 
     @staticmethod
-    def search_parent_from_path(level, page_path):
-        if not page_path or page_path == '/':
+    def get_level_from_path(page_path):
+        return page_path.strip('/').count('/')
+
+    @staticmethod
+    def get_ancestor_paths(page_path):
+        """
+        @:return the paths (without leading and trailing slashes) of the possible ancestors of a page with the given
+        path, from the closest to the farthest. Top level pages (including the root page) have no ancestor.
+        """
+        segments = page_path.strip('/').split('/')
+        return ['/'.join(segments[:i]) for i in range(len(segments) - 1, 0, -1)]
+
+    @staticmethod
+    def search_parent_from_path(page_path, exclude_pk=None):
+        """
+        @:return the closest existing ancestor of a page with the given path, looked up with a single query. E. g.: in
+        '/products' <- '/products/flexipages/detail' there could be no intermediate page for the '/products/flexipages'
+        level.
+        """
+        ancestor_paths = Page.get_ancestor_paths(page_path)
+        if not ancestor_paths:
             return None
-        parent_path = '/'.join(page_path.rstrip('/').split('/')[:-1])
-        # Use level combined with 'path__startswith' to be insensitive to trailing slashes that might not be consistent.
-        parent = Page.objects.filter(level=level - 1, path__startswith=parent_path).first()
-        # Handle possible empty level. E. g.: in '/products' <- '/product/flexipages/detail' there could be no
-        # intermediate page for the '/products/flexipages' level.
-        if not parent and parent_path:
-            return Page.search_parent_from_path(level=level - 1, path=parent_path)
-        return parent
+        # Match paths with and without trailing slashes, which might not be consistent.
+        candidate_paths = ['/%s' % path for path in ancestor_paths] + ['/%s/' % path for path in ancestor_paths]
+        return Page.objects.filter(path__in=candidate_paths).exclude(pk=exclude_pk).order_by('-level', 'pk').first()
+
+    def reparent_subtree(self, previous_parent_id=None):
+        """
+        Link the pages below this page to it when it is their closest ancestor, e.g. when the page is inserted in the
+        middle of the tree, and link its former children that are no longer below it (the page moved) to its former
+        parent.
+        """
+        subtree_path = self.path.strip('/')
+        if subtree_path:
+            subtree_prefix = '/%s/' % subtree_path
+            # Pages whose parent is below this page already have a closer ancestor.
+            Page.objects.filter(path__startswith=subtree_prefix).exclude(pk=self.pk).exclude(parent__path__startswith=subtree_prefix).update(parent=self)
+            Page.objects.filter(parent=self).exclude(path__startswith=subtree_prefix).update(parent=previous_parent_id)
+        else:
+            Page.objects.filter(parent=self).update(parent=previous_parent_id)
 
     def get_parent_for_navigation(self):
         if self.parent and self.parent.priority is None:
             # Recurse in case of hidden page in navigation structure.
-            return self.parent.get_parent_page()
+            return self.parent.get_parent_for_navigation()
         return self.parent
 
     def get_page_timeout_in_seconds(self):
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.none:
+        return self.get_cache_duration_in_seconds(self.cache_timeout)
+
+    def get_page_grace_period_in_seconds(self):
+        return self.get_cache_duration_in_seconds(self.cache_grace_period)
+
+    def get_page_timeout_until_publishing_in_seconds(self):
+        """
+        @:return the page timeout, capped at the next publishing transition of the items of the page (i.e. when any of
+        them gets published or unpublished), so that the cached page never outlives its set of published items.
+        """
+        if not hasattr(self, '_page_timeout_until_publishing'):
+            timeout = self.get_page_timeout_in_seconds()
+            next_publishing_date = PageItem.objects.filter(pageitemlayout__page=self).get_next_publishing_date() if timeout else None
+            if next_publishing_date is not None:
+                # Publishing dates are compared to the current date, in UTC when time zones are enabled.
+                transition = datetime.datetime.combine(next_publishing_date, datetime.time.min)
+                if settings.USE_TZ:
+                    transition = transition.replace(tzinfo=timezone.utc)
+                timeout = min(timeout, max(1, math.ceil((transition - timezone.now()).total_seconds())))
+            self._page_timeout_until_publishing = timeout
+        return self._page_timeout_until_publishing
+
+    @staticmethod
+    def get_cache_duration_in_seconds(duration):
+        if duration == PAGE_CACHE_DURATIONS.none:
             return 0
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.one_minute:
+        if duration == PAGE_CACHE_DURATIONS.one_minute:
             return 60
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.five_minutes:
+        if duration == PAGE_CACHE_DURATIONS.five_minutes:
             return 300
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.fifteen_minutes:
+        if duration == PAGE_CACHE_DURATIONS.fifteen_minutes:
             return 900
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.thirty_minutes:
+        if duration == PAGE_CACHE_DURATIONS.thirty_minutes:
             return 1800
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.one_hour:
+        if duration == PAGE_CACHE_DURATIONS.one_hour:
             return 3600
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.three_hours:
+        if duration == PAGE_CACHE_DURATIONS.three_hours:
             return 3600 * 3
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.six_hours:
+        if duration == PAGE_CACHE_DURATIONS.six_hours:
             return 3600 * 6
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.twelve_hours:
+        if duration == PAGE_CACHE_DURATIONS.twelve_hours:
             return 3600 * 12
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.one_day:
+        if duration == PAGE_CACHE_DURATIONS.one_day:
             return 3600 * 24
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.three_days:
+        if duration == PAGE_CACHE_DURATIONS.three_days:
             return 3600 * 24 * 3
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.one_week:
+        if duration == PAGE_CACHE_DURATIONS.one_week:
             return 3600 * 24 * 7
-        if self.cache_timeout == PAGE_CACHE_DURATIONS.one_month:
+        if duration == PAGE_CACHE_DURATIONS.two_weeks:
+            return 3600 * 24 * 14
+        if duration == PAGE_CACHE_DURATIONS.one_month:
             return 3600 * 24 * 30
         raise ValueError(_("Unrecognized timeout duration."))
 
@@ -204,6 +347,23 @@ class Page(models.Model):
         ordering = ('level', 'priority', 'path')
 
 
+def refresh_navigation_on_sites_change(action, instance, reverse, pk_set, **kwargs):
+    """Refresh the pages whose navigation menus show pages that got added to or removed from sites."""
+    if action in ('post_add', 'post_remove') and pk_set:
+        if reverse:
+            for page in Page.objects.filter(pk__in=pk_set):
+                page.refresh_cache_for_navigation([page.path], sites=[instance])
+        else:
+            instance.refresh_cache_for_navigation([instance.path], sites=Site.objects.filter(pk__in=pk_set))
+
+
+def get_published_items_condition(prefix=''):
+    """@:return the condition on published items, whose fields are looked up with the given prefix (e.g. 'item__')."""
+    today = timezone.now().date()
+    # Items without start date are unpublished.
+    return (Q(**{prefix + 'publishing_end_date__isnull': True}) | Q(**{prefix + 'publishing_end_date__gte': today})) & Q(**{prefix + 'publishing_start_date__lte': today})
+
+
 class PageItemQuerySet(models.QuerySet):
     def get_items_for_page(self, page, is_editing=False):
         items = self.filter(pageitemlayout__page=page)
@@ -212,8 +372,51 @@ class PageItemQuerySet(models.QuerySet):
         return items
 
     def get_published_items(self):
+        return self.filter(get_published_items_condition())
+
+    def get_next_publishing_date(self):
+        """@:return the next date on which any of these items gets published or unpublished, or None if there is none."""
         today = timezone.now().date()
-        return self.filter(Q(publishing_end_date__isnull=True) | Q(publishing_end_date__gte=today)).filter(Q(publishing_start_date__isnull=False) | Q(publishing_start_date__lte=today))
+        dates = self.aggregate(
+            next_start_date=Min('publishing_start_date', filter=Q(publishing_start_date__gt=today)),
+            next_end_date=Min('publishing_end_date', filter=Q(publishing_end_date__gte=today)),
+        )
+        # Items are published until the end of their end date.
+        next_dates = [dates['next_start_date'], dates['next_end_date'] + datetime.timedelta(days=1) if dates['next_end_date'] else None]
+        next_dates = [date for date in next_dates if date is not None]
+        return min(next_dates) if next_dates else None
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        if 'content' in fields or 'content_rendering_mode' in fields:
+            # Keep the stored output in line with the content, as saving does.
+            for obj in objs:
+                obj.update_rendered_content()
+            fields = list(fields) + [field for field in ('rendered_content', 'renderer_version') if field not in fields]
+        # The last update of items is part of the key of their cached fragments.
+        now = timezone.now()
+        for obj in objs:
+            obj.last_updated = now
+        if 'last_updated' not in fields:
+            fields = list(fields) + ['last_updated']
+        result = super().bulk_update(objs, fields, batch_size=batch_size)
+        if 'title' in fields or 'content' in fields:
+            get_search_backend().index_items(objs)
+        delete_cache_for_search_results()
+        self.model.objects.filter(pk__in=[obj.pk for obj in objs]).sync_related_pages()
+        purge_surrogate_keys([get_surrogate_key('item', obj.pk) for obj in objs])
+        return result
+
+    def sync_related_pages(self):
+        """
+        Sync the last update of the pages showing any of these items, and invalidate (or re-render) their cache, in bulk.
+        @:return the pks of the related pages.
+        """
+        page_pks = list(PageItemLayout.objects.filter(item__in=self).order_by().values_list('page_id', flat=True).distinct())
+        if page_pks:
+            Page.objects.filter(pk__in=page_pks).update(last_updated=timezone.now())
+            refresh_cache_for_pages(page_pks)
+            delete_cache_for_sitemaps()
+        return page_pks
 
 
 class PageItemManager(models.Manager):
@@ -226,6 +429,10 @@ class PageItemManager(models.Manager):
     def get_published_items(self):
         return self.get_queryset().get_published_items()
 
+    def bulk_update(self, objs, fields, batch_size=None):
+        """Update the given fields of many items at once, and sync the pages showing them."""
+        return self.get_queryset().bulk_update(objs, fields, batch_size=batch_size)
+
 
 class PageItem(models.Model):
     CONTENT_RENDERING_MODE_CHOICES = (
@@ -246,6 +453,8 @@ class PageItem(models.Model):
     use_wysiwyg_editor = models.BooleanField(_('use WYSIWYG editor'), default=True, help_text=_("Indicates whether the content should be rendered with a WYSIWYG editor for HTML."))
     author = models.ForeignKey(User, verbose_name=_('author'), related_name='authors_items', null=True, on_delete=models.SET_NULL, blank=True, help_text=_("The author of this item."))
     last_edited_by = models.ForeignKey(User, verbose_name=_('last edited by'), related_name='edited_items', null=True, on_delete=models.SET_NULL, blank=True, help_text=_("The edited items of the author."))
+    rendered_content = models.TextField(_('rendered content'), default='', blank=True, editable=False, help_text=_("The output of the content, stored for rendering modes that only depend on the content."))
+    renderer_version = models.CharField(_('renderer version'), max_length=32, default='', blank=True, editable=False, help_text=_("The version of the renderer that produced the rendered content."))
     created = models.DateTimeField(auto_now_add=True, db_index=True, editable=False)
     last_updated = models.DateTimeField(db_index=True, auto_now=True, editable=False)
 
@@ -280,55 +489,104 @@ class PageItem(models.Model):
         if not self.description:
             # Extract the first few words of the content and remove the html tags.
             self.description = striptags(truncatewords_html(self.content, 15))[:257]
-        if hasattr(self, '_renderer'):
-            delattr(self, '_renderer')
         if not self.author:
             self.author = self.last_edited_by
+        is_pre_rendered = self.update_rendered_content()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'rendered_content', 'renderer_version'}
         super().save(*args, **kwargs)
-
-        # Sync last update of pages showing this item.
-        related_pages = Page.objects.filter(id__in=self.pageitemlayout_set.values_list('page_id', flat=True))
-        related_pages.update(last_updated=timezone.now())
-
-        # Invalidate cache.
-        for page in related_pages:
-            delete_cache_for_page(page)
+        if not is_pre_rendered and self.update_rendered_content():
+            # The output of new items may depend on their pk.
+            PageItem.objects.filter(pk=self.pk).update(rendered_content=self.rendered_content, renderer_version=self.renderer_version)
+        get_search_backend().index_items([self])
+        delete_cache_for_search_results()
+
+        # Sync last update of pages showing this item, and invalidate their cache.
+        PageItem.objects.filter(pk=self.pk).sync_related_pages()
+        purge_surrogate_keys([get_surrogate_key('item', self.pk)])
+
+    def delete(self, *args, **kwargs):
+        # Pages showing this item are synced before its layouts are deleted along with it.
+        PageItem.objects.filter(pk=self.pk).sync_related_pages()
+        purge_surrogate_keys([get_surrogate_key('item', self.pk)])
+        delete_cache_for_search_results()
+        return super().delete(*args, **kwargs)
 
     def render(self):
+        edition_context = getattr(self, EDITION_CONTEXT_ATTRIBUTE_NAME, None)
+        is_editing = edition_context and edition_context.get(IS_EDITING_ATTRIBUTE_NAME, False)
+        cached_fragment = getattr(self, CACHED_FRAGMENT_ATTRIBUTE_NAME, None)
+        if cached_fragment is not None and not is_editing:
+            return cached_fragment
         if self.content_rendering_mode == CONTENT_RENDERING_MODE.html:
             # Rendered content is equal to content when rendering is set to HTML.
             rendered_content = self.content
         elif self.content_rendering_mode == CONTENT_RENDERING_MODE.django_template:
-            # Build renderer if needed.
-            if not hasattr(self, '_renderer'):
-                setattr(self, '_renderer', StringTemplateRenderer(self.content, extra_tags=['flexipages']))
-            rendered_content = self._renderer.render_template(context=dict(item=self))
-        elif self.content_rendering_mode == CONTENT_RENDERING_MODE.markdown:
-            rendered_content = mark_safe(markdown2.markdown(self.content, extras=["header-ids", "tables", "fenced-code-blocks"]))
-        elif self.content_rendering_mode == CONTENT_RENDERING_MODE.json:
-            try:
-                json_data = json.loads(self.content)
-            except JSONDecodeError as e:
-                json_data = dict(error=str(e))
-                pass
-            # Render as script tag containing escaped JSON data.
-            rendered_content = json_script(json_data, 'content_data_%i' % self.pk)
+            # The renderer (and its compiled template) is shared across requests until the item is updated.
+            renderer = item_renderers_cache.get_renderer(self)
+            rendered_content = renderer.render_template(context=dict(item=self))
+        elif self.content_rendering_mode in PRE_RENDERED_CONTENT_RENDERING_MODES:
+            if self.has_up_to_date_rendered_content():
+                rendered_content = mark_safe(self.rendered_content)
+            else:
+                rendered_content = self.pre_render_content()
         elif self.content_rendering_mode == CONTENT_RENDERING_MODE.javascript:
             rendered_content = format_html('<script>{}</script>', self.content)
         else:
             raise ValueError("Unknown rendering mode.")
         rendered_content = '<a id="item_%s"></a>%s' % (self.pk, rendered_content)
         rendered_content = mark_safe(rendered_content)
-        edition_context = getattr(self, EDITION_CONTEXT_ATTRIBUTE_NAME, None)
-        if edition_context and edition_context.get(IS_EDITING_ATTRIBUTE_NAME, False):
+        if is_editing:
             django_engine = engines['django']
             template = django_engine.get_template('flexipages/edition/item_toolbar.html')
             rendered_content = template.render(context=dict(edition_context=edition_context, item=self, rendered_content=rendered_content))
+        else:
+            # Keep the rendering, so that it can be stored in the fragments cache along with the page.
+            setattr(self, RENDERED_FRAGMENT_ATTRIBUTE_NAME, rendered_content)
         return rendered_content
 
+    def pre_render_content(self):
+        """Render the content of items whose output only depends on their content (e.g. Markdown or JSON)."""
+        if self.content_rendering_mode == CONTENT_RENDERING_MODE.markdown:
+            return mark_safe(markdown2.markdown(self.content, extras=list(MARKDOWN_EXTRAS)))
+        elif self.content_rendering_mode == CONTENT_RENDERING_MODE.json:
+            try:
+                json_data = json.loads(self.content)
+            except JSONDecodeError as e:
+                json_data = dict(error=str(e))
+                pass
+            # Render as script tag containing escaped JSON data.
+            return json_script(json_data, 'content_data_%i' % self.pk)
+        raise ValueError("Content cannot be pre-rendered with this rendering mode.")
+
+    @staticmethod
+    def get_renderer_version(content_rendering_mode):
+        """Get the version of the stored output for the given rendering mode, which changes along with the renderer."""
+        if content_rendering_mode not in PRE_RENDERED_CONTENT_RENDERING_MODES:
+            return ''
+        version = '%s|%s|%s|%s' % (CONTENT_RENDERER_VERSION, content_rendering_mode, markdown2.__version__, ','.join(MARKDOWN_EXTRAS))
+        return hashlib.md5(version.encode('utf-8')).hexdigest()
+
+    def has_up_to_date_rendered_content(self):
+        return bool(self.renderer_version) and self.renderer_version == self.get_renderer_version(self.content_rendering_mode)
+
+    def update_rendered_content(self):
+        """Store the output of the content when it only depends on the content. @:return True if it was updated."""
+        can_be_pre_rendered = self.content_rendering_mode in PRE_RENDERED_CONTENT_RENDERING_MODES
+        # JSON data is rendered with an id that depends on the pk of the item.
+        if can_be_pre_rendered and (self.pk or self.content_rendering_mode != CONTENT_RENDERING_MODE.json):
+            self.rendered_content = self.pre_render_content()
+            self.renderer_version = self.get_renderer_version(self.content_rendering_mode)
+            return True
+        self.rendered_content = ''
+        self.renderer_version = ''
+        return False
+
     @property
     def tag_names(self):
-        return self.tags.values_list('name', flat=True)
+        # Use tags prefetched along with the item, if any.
+        return [tag.name for tag in self.tags.all()]
 
     @property
     def is_not_published_yet(self):
@@ -341,9 +599,24 @@ class PageItem(models.Model):
     class Meta:
         verbose_name = _('page item')
         verbose_name_plural = _('page items')
+        indexes = [
+            # Published items and their next publishing transitions (items without start date are never published).
+            models.Index(fields=['publishing_start_date', 'publishing_end_date'], name='flexipages_item_publishing_idx', condition=Q(publishing_start_date__isnull=False)),
+        ]
+
+
+class PageItemLayoutManager(models.Manager):
+    def get_layouts_for_page(self, page, is_editing=False):
+        """Get the layouts of the (published) items of the given page, along with their items and the tags of these items."""
+        layouts = self.filter(page=page)
+        if not is_editing:
+            # Joined rather than in a subquery, so that the layouts of the page are looked up first.
+            layouts = layouts.filter(get_published_items_condition('item__'))
+        return layouts.select_related('item').prefetch_related('item__tags')
 
 
 class PageItemLayout(models.Model):
+    objects = PageItemLayoutManager()
     item = models.ForeignKey(PageItem, on_delete=models.CASCADE, verbose_name=_('item'), help_text=_("The item that we want to locate on the given page."))
     page = models.ForeignKey(Page, on_delete=models.CASCADE, verbose_name=_('page'), help_text=_("The page where the item must be displayed."))
     priority = models.SmallIntegerField(_('priority'), default=None, blank=True, null=True, help_text=_("The priority for the selected item on the given page, and the given zone if defined. Lowest priority comes first. An empty field implies that items are sorted by reversed chronological order of items creation."))
@@ -351,11 +624,21 @@ class PageItemLayout(models.Model):
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
+        delete_cache_for_search_results()
 
         # Sync last update of page showing the item from this layout.
         self.page.last_updated = timezone.now()
         self.page.save(update_fields=['last_updated'])
 
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        delete_cache_for_search_results()
+
+        # Sync last update of page that showed the item from this layout.
+        self.page.last_updated = timezone.now()
+        self.page.save(update_fields=['last_updated'])
+        return result
+
     def __str__(self):
         return '%s, %s' % (self.page, self.item)
 
@@ -364,6 +647,25 @@ class PageItemLayout(models.Model):
         verbose_name_plural = _('page item layouts')
         unique_together = ('page', 'item')
         ordering = ['page', 'zone_name', 'priority', '-item__created']
+        indexes = [
+            # The layouts of a page, in display order.
+            models.Index(fields=['page', 'zone_name', 'priority'], name='flexipages_layout_order_idx'),
+        ]
+
+
+class SearchIndexEntry(models.Model):
+    """An entry of the built-in inverted index of items: a term of an item, along with its weight in this item."""
+    term = models.CharField(_('term'), max_length=64)
+    item = models.ForeignKey(PageItem, on_delete=models.CASCADE, related_name='search_index_entries', verbose_name=_('item'))
+    weight = models.PositiveIntegerField(_('weight'), default=1)
+
+    def __str__(self):
+        return '%s, %s' % (self.term, self.item_id)
+
+    class Meta:
+        verbose_name = _('search index entry')
+        verbose_name_plural = _('search index entries')
+        unique_together = ('term', 'item')
 
 
 def validate_path_prefix(value):
@@ -382,6 +684,19 @@ class SiteConfiguration(models.Model):
     def __str__(self):
         return '%s for %s' % (self._meta.verbose_name, self.site)
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Routing tables hold the site configuration, and rendered pages depend on the path prefix of the site.
+        invalidate_routing_tables()
+        delete_cache_for_site(self.site)
+        delete_cache_for_sitemaps()
+
+    def delete(self, *args, **kwargs):
+        invalidate_routing_tables()
+        delete_cache_for_site(self.site)
+        delete_cache_for_sitemaps()
+        return super().delete(*args, **kwargs)
+
     class Meta:
         verbose_name = _('site configuration')
         verbose_name_plural = _('sites configuration')
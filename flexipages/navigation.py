@@ -0,0 +1,98 @@
+from django.urls import get_script_prefix
+from django.utils.encoding import iri_to_uri
+
+
+class NavigationNode(object):
+    """
+    A page of the navigation tree of a site, holding what menus need to link to it. Pages without priority are hidden
+    from navigation: they are skipped in ancestors and never listed as children.
+    """
+    def __init__(self, page_pk, path, title, priority):
+        self.pk = page_pk
+        self.path = path
+        self.title = title
+        self.priority = priority
+        self.parent = None
+        self.children = []
+
+    @property
+    def is_hidden(self):
+        return self.priority is None
+
+    def get_absolute_url(self):
+        # Same as Page.get_absolute_url().
+        return iri_to_uri(get_script_prefix().rstrip('/') + self.path)
+
+    def get_ancestors(self):
+        """@:return the visible ancestors of this page, from the top level down to its parent."""
+        ancestors = []
+        node = self.parent
+        while node is not None:
+            ancestors.append(node)
+            node = node.parent
+        ancestors.reverse()
+        return ancestors
+
+    def __str__(self):
+        return self.title
+
+
+class NavigationTree(object):
+    """
+    The navigation tree of the pages of a site. The parent of a page is its closest visible ancestor by path (e.g.
+    '/products' for '/products/flexipages/detail' when there is no '/products/flexipages' page or when it is hidden).
+    Top level pages have no parent, and children are sorted by priority, then by path.
+    """
+    def __init__(self, pages):
+        """@:param pages: iterable of (pk, path, title, priority) tuples of the pages of the site."""
+        self.nodes = dict()
+        self.nodes_by_path = dict()
+        for page_pk, path, title, priority in pages:
+            node = NavigationNode(page_pk, path, title, priority)
+            self.nodes[page_pk] = node
+            self.nodes_by_path.setdefault(path.strip('/'), node)
+        self.top_level_nodes = []
+        for node in self.nodes.values():
+            node.parent = self.find_parent(self.nodes_by_path, node.path)
+            if not node.is_hidden:
+                (node.parent.children if node.parent else self.top_level_nodes).append(node)
+        for nodes in [self.top_level_nodes] + [node.children for node in self.nodes.values()]:
+            nodes.sort(key=lambda n: (n.priority, n.path))
+
+    @staticmethod
+    def find_parent(nodes_by_path, page_path):
+        segments = page_path.strip('/').split('/')
+        for i in range(len(segments) - 1, 0, -1):
+            parent = nodes_by_path.get('/'.join(segments[:i]))
+            if parent is not None and not parent.is_hidden:
+                return parent
+        return None
+
+    def get_page_pks_showing_path(self, path):
+        """
+        @:return the pks of the pages whose navigation shows a page with the given path (or would show it, if there is
+        none), i.e. its parent, its siblings, and the pages below it, which have it among their ancestors.
+        """
+        parent = self.find_parent(self.nodes_by_path, path)
+        page_pks = set(node.pk for node in (parent.children if parent else self.top_level_nodes))
+        if parent is not None:
+            page_pks.add(parent.pk)
+        path_prefix = path.strip('/') + '/'
+        page_pks.update(node.pk for node in self.nodes.values() if node.path.strip('/').startswith(path_prefix))
+        return page_pks
+
+    def get_navigation_for_page(self, page_pk):
+        """
+        @:return a dict with the navigation node of the given page, its parent, ancestors, siblings (including the page
+        itself when it is visible) and children, ready to be rendered by menus.
+        """
+        node = self.nodes.get(page_pk)
+        if node is None:
+            return dict(node=None, parent=None, ancestors=[], siblings=[], children=[])
+        return dict(
+            node=node,
+            parent=node.parent,
+            ancestors=node.get_ancestors(),
+            siblings=node.parent.children if node.parent else self.top_level_nodes,
+            children=node.children,
+        )
@@ -0,0 +1,77 @@
+import logging
+import urllib.request
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_SURROGATE_KEY = 'flexipages'
+
+_purge_backend = dict(path=None, backend=None)
+
+
+def get_surrogate_key(scope, pk):
+    return 'flexipages-%s-%s' % (scope, pk)
+
+
+class BasePurgeBackend(object):
+    """
+    Base class for backends invalidating pages in a reverse proxy or CDN in front of the site, based on the surrogate
+    keys that tag the responses.
+    """
+    def purge(self, surrogate_keys):
+        raise NotImplementedError
+
+
+class HttpPurgeBackend(BasePurgeBackend):
+    """
+    Send a PURGE request to FLEXIPAGES_PURGE_URL with the surrogate keys to invalidate in the first header of
+    FLEXIPAGES_SURROGATE_KEY_HEADERS (e.g. Varnish with xkey, or any local HTTP stub).
+    """
+    def __init__(self):
+        self.url = settings.FLEXIPAGES_PURGE_URL
+        self.header = settings.FLEXIPAGES_SURROGATE_KEY_HEADERS[0]
+        self.timeout = settings.FLEXIPAGES_PURGE_TIMEOUT
+
+    def purge(self, surrogate_keys):
+        request = urllib.request.Request(self.url, method='PURGE', headers={self.header: format_surrogate_keys(self.header, surrogate_keys)})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout):
+                pass
+        except OSError as e:
+            logger.warning("Cannot purge surrogate keys %s at %s: %s", surrogate_keys, self.url, e)
+
+
+class LocalMemoryPurgeBackend(BasePurgeBackend):
+    """Keep track of purged surrogate keys in memory, for tests and development."""
+    def __init__(self):
+        self.purged_keys = []
+
+    def purge(self, surrogate_keys):
+        self.purged_keys.extend(surrogate_keys)
+
+
+def get_purge_backend():
+    path = settings.FLEXIPAGES_PURGE_BACKEND
+    if not path:
+        return None
+    if _purge_backend['path'] != path:
+        _purge_backend['backend'] = import_string(path)()
+        _purge_backend['path'] = path
+    return _purge_backend['backend']
+
+
+def purge_surrogate_keys(surrogate_keys):
+    """Purge the responses tagged with any of the given surrogate keys, once the ongoing transaction is committed."""
+    backend = get_purge_backend()
+    if backend is not None and surrogate_keys:
+        surrogate_keys = list(surrogate_keys)
+        transaction.on_commit(lambda: backend.purge(surrogate_keys))
+
+
+def format_surrogate_keys(header, surrogate_keys):
+    # Cache-Tag values are comma separated whereas Surrogate-Key values are space separated.
+    separator = ',' if header.lower() == 'cache-tag' else ' '
+    return separator.join(surrogate_keys)
@@ -0,0 +1,54 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from stringrenderer import StringTemplateRenderer
+
+
+class RendererCache(object):
+    """
+    Process-wide LRU cache of the template renderers of items, so that the content of items rendered as Django
+    templates is parsed once, and not on every request.
+    """
+    def __init__(self):
+        self._renderers = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(item):
+        # Changes of saved items are tracked with their last update, whereas unsaved items are identified by content.
+        if item.pk and item.last_updated:
+            return item.pk, item.last_updated
+        return None, hashlib.md5(item.content.encode('utf-8')).hexdigest()
+
+    def get_renderer(self, item):
+        key = self.get_key(item)
+        with self._lock:
+            renderer = self._renderers.get(key)
+            if renderer is not None:
+                self._renderers.move_to_end(key)
+                self.hits += 1
+                return renderer
+            self.misses += 1
+            # The template itself is only compiled when first rendered.
+            renderer = StringTemplateRenderer(item.content, extra_tags=['flexipages'])
+            self._renderers[key] = renderer
+            while len(self._renderers) > settings.FLEXIPAGES_ITEM_RENDERERS_CACHE_SIZE:
+                self._renderers.popitem(last=False)
+        return renderer
+
+    def clear(self):
+        with self._lock:
+            self._renderers.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        return dict(hits=self.hits, misses=self.misses, size=len(self._renderers), max_size=settings.FLEXIPAGES_ITEM_RENDERERS_CACHE_SIZE)
+
+
+item_renderers_cache = RendererCache()
@@ -0,0 +1,83 @@
+import uuid
+from collections import namedtuple
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import transaction
+
+from flexipages.cache import get_pages_cache, delete_cache_for_sitemaps
+from flexipages.navigation import NavigationTree
+from flexipages.sites import get_site_config
+
+ROUTING_VERSION_CACHE_KEY = 'flexipages|routing|version'
+
+PageRoute = namedtuple('PageRoute', 'page_pk path registration_required cache_timeout template_pk template_name')
+
+
+class RoutingTable(object):
+    """
+    In-memory index of the pages available on a given site, mapping page paths to their routing data, along with the
+    navigation tree of these pages.
+    """
+    def __init__(self, site, version):
+        Page = django_apps.get_model('flexipages.Page')
+        self.site_id = site.pk
+        self.version = version
+        self.site_config = get_site_config(site)
+        self.routes = dict()
+        navigation_pages = []
+        pages = Page.objects.filter(sites=site).values_list('pk', 'path', 'registration_required', 'cache_timeout', 'template_id', 'template__name', 'title', 'priority')
+        for page_pk, path, registration_required, cache_timeout, template_pk, template_name, title, priority in pages.iterator():
+            self.routes[path] = PageRoute(page_pk, path, registration_required, cache_timeout, template_pk, template_name)
+            navigation_pages.append((page_pk, path, title, priority))
+        self.navigation = NavigationTree(navigation_pages)
+
+    @property
+    def path_prefix(self):
+        return self.site_config.path_prefix if self.site_config else ''
+
+    def resolve(self, path):
+        """@:return the route of the page with the given path (path prefix excluded), or None if no page matches."""
+        route = self.routes.get(path)
+        if route is None and not path.endswith('/') and settings.APPEND_SLASH:
+            route = self.routes.get(path + '/')
+        return route
+
+
+# Routing tables are built lazily by each worker, and kept as long as the shared routing version does not change.
+_routing_tables = dict()
+
+
+def get_routing_version():
+    pages_cache = get_pages_cache()
+    version = pages_cache.get(ROUTING_VERSION_CACHE_KEY)
+    if version is None:
+        # The version is unknown (first use or eviction): start a new one so that any existing table gets rebuilt.
+        version = uuid.uuid4().hex
+        if not pages_cache.add(ROUTING_VERSION_CACHE_KEY, version, None):
+            version = pages_cache.get(ROUTING_VERSION_CACHE_KEY) or version
+    return version
+
+
+def get_routing_table(site):
+    version = get_routing_version()
+    routing_table = _routing_tables.get(site.pk)
+    if routing_table is None or routing_table.version != version:
+        routing_table = RoutingTable(site, version)
+        _routing_tables[site.pk] = routing_table
+    return routing_table
+
+
+def invalidate_routing_tables():
+    """
+    Force all workers to rebuild their routing tables on their next request. The shared version is only changed once
+    the ongoing transaction (if any) is committed, so that no worker rebuilds its tables from outdated data.
+    """
+    transaction.on_commit(lambda: get_pages_cache().set(ROUTING_VERSION_CACHE_KEY, uuid.uuid4().hex, None))
+
+
+def invalidate_routing_tables_on_sites_change(action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_routing_tables()
+        # Sitemaps list the pages of each site.
+        delete_cache_for_sitemaps()
@@ -6,18 +6,31 @@ from rules import is_superuser
 # An full admin is also a restricted admin logically speaking, but full admins only belong to the full admin group.
 # Therefore, writing is_mygym_restricted_admin to detect whether a full admin is at least a restricted admin won't work!
 from flexipages.constants import FLEXIPAGES_EDITOR_GROUP_NAME, FLEXIPAGES_SITE_DESIGNER_GROUP_NAME, FLEXIPAGES_ADMIN_GROUP_NAME
+from flexipages.utils import get_flexipages_group_names
 
-is_cms_admin = rules.is_group_member(FLEXIPAGES_ADMIN_GROUP_NAME)
-is_cms_editor = rules.is_group_member(FLEXIPAGES_EDITOR_GROUP_NAME)
-is_cms_designer = rules.is_group_member(FLEXIPAGES_SITE_DESIGNER_GROUP_NAME)
+
+# Group memberships are fetched at once and cached, the same way as for the edition context of pages.
+@rules.predicate
+def is_cms_admin(user):
+    return FLEXIPAGES_ADMIN_GROUP_NAME in get_flexipages_group_names(user)
+
+
+@rules.predicate
+def is_cms_editor(user):
+    return FLEXIPAGES_EDITOR_GROUP_NAME in get_flexipages_group_names(user)
+
+
+@rules.predicate
+def is_cms_designer(user):
+    return FLEXIPAGES_SITE_DESIGNER_GROUP_NAME in get_flexipages_group_names(user)
 
 
 # Special general managers.
 # NB: It is required to be able to manage notifications in order to fully manage events (i.e. create and send
 # invitation, reminders, schedule, etc.). Therefore, any events manager is can implicitly manage notifications.
-can_edit_content = is_superuser or is_cms_admin or is_cms_designer or is_cms_editor,
-can_edit_template = is_superuser or is_cms_designer,
-can_edit_page = is_superuser or is_cms_admin
+can_edit_content = is_superuser | is_cms_admin | is_cms_designer | is_cms_editor
+can_edit_template = is_superuser | is_cms_designer
+can_edit_page = is_superuser | is_cms_admin
 
 
 # Standard permissions.
@@ -0,0 +1,136 @@
+import html
+import re
+from collections import Counter
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db.models import Case, CharField, Count, F, Q, Sum, Value, When
+from django.template.defaultfilters import striptags
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+from flexipages.utils import get_formatted_match
+
+# Terms of the title of items weigh more than terms of their content when ranking results.
+TITLE_TERM_WEIGHT = 5
+MAX_TERM_LENGTH = 64
+
+_search_backend = dict(path=None, backend=None)
+
+
+def get_search_terms(text):
+    """Tokenize the given text (HTML tags excluded) into lowercase terms."""
+    return [term[:MAX_TERM_LENGTH] for term in re.findall(r'\w+', html.unescape(striptags(text)).lower())]
+
+
+def get_weighted_terms(title, content):
+    """@:return the terms of the given title and content of an item, mapped to their weight in the item."""
+    weights = Counter(get_search_terms(content))
+    for term in get_search_terms(title):
+        weights[term] += TITLE_TERM_WEIGHT
+    return weights
+
+
+def normalize_searched_text(to_search):
+    """Lowercase the searched text and collapse its whitespaces, so that equivalent searches share their results."""
+    # Lowercase like indexed terms: case folding would not match some of them (e.g. 'ß' is folded into 'ss').
+    return ' '.join(to_search.split()).lower()
+
+
+class SearchResult(object):
+    """
+    An item matching the searched text, along with the pages showing it. The match is only formatted when displayed.
+    """
+    def __init__(self, item, pages, to_search):
+        self.item = item
+        self.pages = pages
+        self.to_search = to_search
+
+    @cached_property
+    def match(self):
+        """The searched text in the title, or else in the plain text of the content, or else any searched term."""
+        text = striptags(self.item.content)
+        for searched in [self.to_search] + get_search_terms(self.to_search):
+            match = get_formatted_match(text=self.item.title, to_search=searched) or get_formatted_match(text=text, to_search=searched)
+            if match:
+                return match
+        # Backends may match other forms of the searched terms (e.g. stemming), which cannot be highlighted.
+        return self.item.description
+
+
+class BaseSearchBackend(object):
+    """
+    Base class for backends searching the contents of items.
+    """
+    def index_items(self, items):
+        """Update the index (if any) with the current title and content of the given items."""
+        pass
+
+    def search(self, to_search, items, limit=None):
+        """@:return the pks of the given items that match the searched text, the best match first, and at most limit."""
+        raise NotImplementedError
+
+
+class InvertedIndexSearchBackend(BaseSearchBackend):
+    """
+    Search items in the built-in inverted index, which maps the terms of the title and content of each item (HTML tags
+    excluded) to their weight in the item. Items matching all the searched terms are ranked by the total weight of
+    these terms. The last searched term matches by prefix, since it is often still being typed.
+    """
+    def index_items(self, items):
+        SearchIndexEntry = django_apps.get_model('flexipages.SearchIndexEntry')
+        entries = []
+        for item in items:
+            weights = get_weighted_terms(item.title, item.content)
+            entries += [SearchIndexEntry(item_id=item.pk, term=term, weight=weight) for term, weight in weights.items()]
+        SearchIndexEntry.objects.filter(item__in=[item.pk for item in items]).delete()
+        SearchIndexEntry.objects.bulk_create(entries)
+
+    def search(self, to_search, items, limit=None):
+        SearchIndexEntry = django_apps.get_model('flexipages.SearchIndexEntry')
+        terms = get_search_terms(to_search)
+        if not terms:
+            return []
+        prefix = terms[-1]
+        terms = set(terms[:-1])
+        if any(term.startswith(prefix) for term in terms):
+            # The prefix is matched by any item matching the other terms.
+            prefix = None
+        condition = Q(term__in=terms)
+        # Entries are counted per searched term, so that a prefix matching several terms of an item counts once.
+        searched_term = F('term')
+        if prefix is not None:
+            condition |= Q(term__startswith=prefix)
+            searched_term = Case(When(term__in=terms, then=F('term')), default=Value(prefix), output_field=CharField())
+        matches = SearchIndexEntry.objects.filter(condition, item__in=items).values('item')\
+            .annotate(term_count=Count(searched_term, distinct=True), score=Sum('weight'))\
+            .filter(term_count=len(terms) + (prefix is not None)).order_by('-score', '-item')
+        return [match['item'] for match in matches[:limit]]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    Search items with the full-text search of PostgreSQL (requires 'django.contrib.postgres'), in the text search
+    configuration given by FLEXIPAGES_POSTGRES_SEARCH_CONFIG. Nothing is indexed by the backend itself: a GIN index
+    on the search vector may be added to the database for large sites.
+    """
+    def search(self, to_search, items, limit=None):
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        terms = get_search_terms(to_search)
+        if not terms:
+            return []
+        config = settings.FLEXIPAGES_POSTGRES_SEARCH_CONFIG
+        vector = SearchVector('title', weight='A', config=config) + SearchVector('content', weight='B', config=config)
+        # Terms are made of word characters only, and the last one matches by prefix.
+        query = SearchQuery(' & '.join(terms) + ':*', config=config, search_type='raw')
+        matches = items.annotate(search=vector).filter(search=query).annotate(rank=SearchRank(vector, query)).order_by('-rank', '-pk')
+        return list(matches.values_list('pk', flat=True)[:limit])
+
+
+def get_search_backend():
+    path = settings.FLEXIPAGES_SEARCH_BACKEND
+    if _search_backend['path'] != path:
+        _search_backend['backend'] = import_string(path)()
+        _search_backend['path'] = path
+    return _search_backend['backend']
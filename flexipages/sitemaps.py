@@ -1,34 +1,41 @@
 from django.apps import apps as django_apps
 from django.contrib.sitemaps import Sitemap
 from django.core.exceptions import ImproperlyConfigured
+from django.urls import get_script_prefix
+from django.utils.encoding import iri_to_uri
 
-from flexipages.utils import get_site_config
+from flexipages.routing import get_routing_table
 
 
 class FlexiPagesSitemap(Sitemap):
+    """
+    Sitemap of the public pages of the current site, split into pages of at most limit URLs (listed by the sitemap
+    index). Pages are fetched as (path, last update) tuples, i.e. without building model instances.
+    """
+    limit = 50000
+
     def __init__(self):
         self.current_site = None
-        self.path_prefix = None
+        self.path_prefix = ''
 
     def items(self):
         if not django_apps.is_installed('django.contrib.sites'):
             raise ImproperlyConfigured("FlexiPages requires django.contrib.sites, which isn't installed.")
         Site = django_apps.get_model('sites.Site')
-        current_site = Site.objects.get_current()
-        if current_site != self.current_site:
-            self.current_site = current_site
-            self.path_prefix = None
-        return self.current_site.page_set.filter(registration_required=False)
+        Page = django_apps.get_model('flexipages.Page')
+        self.current_site = Site.objects.get_current()
+        self.path_prefix = get_routing_table(self.current_site).path_prefix
+        # Pages are ordered, so that paginated sitemaps are consistent.
+        return Page.objects.filter(sites=self.current_site, registration_required=False).order_by('pk').values_list('path', 'last_updated')
 
     def location(self, obj):
-        if self.path_prefix is None:
-            self.path_prefix = ''
-            if self.current_site is not None:
-                current_config = get_site_config(self.current_site)
-                if current_config:
-                    self.path_prefix = current_config.path_prefix
-        # Build dynamic absolute URL with proper path prefix.
-        return self.path_prefix + obj.get_absolute_url()
+        path, last_updated = obj
+        # Same as Page.get_absolute_url(), with the path prefix of the site.
+        return self.path_prefix + iri_to_uri(get_script_prefix().rstrip('/') + path)
 
     def lastmod(self, obj):
-        return obj.last_updated
+        path, last_updated = obj
+        return last_updated
+
+
+sitemaps = {'flexipages': FlexiPagesSitemap}
@@ -0,0 +1,103 @@
+import uuid
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.sites import shortcuts
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.http.request import split_domain_port
+
+from flexipages.cache import get_pages_cache
+
+SITE_REGISTRY_VERSION_CACHE_KEY = 'flexipages|sites|version'
+
+
+class SiteRegistry(object):
+    """
+    In-memory index of all the sites along with their configuration (if any), by pk and by domain, loaded with a single
+    query.
+    """
+    def __init__(self, version):
+        Site = django_apps.get_model('sites.Site')
+        self.version = version
+        self.sites_by_pk = dict()
+        self.sites_by_domain = dict()
+        self.site_configs = dict()
+        for site in Site.objects.select_related('siteconfiguration__search_results_template'):
+            self.sites_by_pk[site.pk] = site
+            self.sites_by_domain[site.domain.lower()] = site
+            try:
+                self.site_configs[site.pk] = site.siteconfiguration
+            except ObjectDoesNotExist:
+                self.site_configs[site.pk] = None
+
+    def get_site_for_request(self, request):
+        """
+        @:return the site with the SITE_ID setting, or else the site matching the host of the request (as Django does),
+        or None if the registry does not know it.
+        """
+        site_id = getattr(settings, 'SITE_ID', '')
+        if site_id:
+            return self.sites_by_pk.get(site_id)
+        host = request.get_host().lower()
+        site = self.sites_by_domain.get(host)
+        if site is None:
+            domain, port = split_domain_port(host)
+            site = self.sites_by_domain.get(domain)
+        return site
+
+
+# Registries are built lazily by each worker, and kept as long as the shared registry version does not change.
+_site_registry = dict(registry=None)
+
+
+def get_site_registry_version():
+    pages_cache = get_pages_cache()
+    version = pages_cache.get(SITE_REGISTRY_VERSION_CACHE_KEY)
+    if version is None:
+        # The version is unknown (first use or eviction): start a new one so that any existing registry gets rebuilt.
+        version = uuid.uuid4().hex
+        if not pages_cache.add(SITE_REGISTRY_VERSION_CACHE_KEY, version, None):
+            version = pages_cache.get(SITE_REGISTRY_VERSION_CACHE_KEY) or version
+    return version
+
+
+def get_site_registry():
+    version = get_site_registry_version()
+    site_registry = _site_registry['registry']
+    if site_registry is None or site_registry.version != version:
+        site_registry = SiteRegistry(version)
+        _site_registry['registry'] = site_registry
+    return site_registry
+
+
+def get_current_site(request):
+    """
+    Same as django.contrib.sites.shortcuts.get_current_site(), from the site registry. Sites unknown to the registry
+    (e.g. created by the ongoing transaction) are looked up in the database.
+    """
+    site = get_site_registry().get_site_for_request(request)
+    if site is None:
+        site = shortcuts.get_current_site(request)
+    return site
+
+
+def get_site_config(site):
+    """@:return the configuration of the given site (with its search results template), or None if it has none."""
+    site_configs = get_site_registry().site_configs
+    if site.pk in site_configs:
+        return site_configs[site.pk]
+    SiteConfiguration = django_apps.get_model('flexipages.SiteConfiguration')
+    return SiteConfiguration.objects.filter(site=site).select_related('search_results_template').first()
+
+
+def invalidate_site_registry():
+    """
+    Force all workers to reload their site registry on their next request, once the ongoing transaction (if any) is
+    committed.
+    """
+    transaction.on_commit(lambda: get_pages_cache().set(SITE_REGISTRY_VERSION_CACHE_KEY, uuid.uuid4().hex, None))
+
+
+def invalidate_site_registry_on_change(**kwargs):
+    invalidate_site_registry()
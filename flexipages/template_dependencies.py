@@ -0,0 +1,55 @@
+from django.apps import apps as django_apps
+from django.db.models import Count, Max
+from django.template.base import Lexer, TokenType
+
+DEPENDENCY_TAG_NAMES = ('extends', 'include')
+
+# The dependency graph is memoized per worker as long as no template is added, changed or removed.
+_dependency_graph = dict(signature=None, dependents=dict())
+
+
+def get_template_dependencies(template_content):
+    """
+    Get the names of the templates that the given template content extends or includes. Template names given by
+    variables cannot be resolved statically, and are therefore ignored.
+    """
+    dependencies = set()
+    for token in Lexer(template_content).tokenize():
+        if token.token_type != TokenType.BLOCK:
+            continue
+        bits = token.split_contents()
+        if len(bits) > 1 and bits[0] in DEPENDENCY_TAG_NAMES:
+            name = bits[1]
+            if len(name) > 1 and name[0] == name[-1] and name[0] in ('"', "'"):
+                dependencies.add(name[1:-1])
+    return dependencies
+
+
+def get_template_dependents_graph():
+    """
+    Get the reversed dependency graph of the page templates, i.e. a dict mapping each template name to the names of
+    the templates that directly extend or include it.
+    """
+    PageTemplate = django_apps.get_model('flexipages.PageTemplate')
+    signature = PageTemplate.objects.aggregate(count=Count('pk'), last_changed=Max('last_changed'))
+    if signature != _dependency_graph['signature']:
+        dependents = dict()
+        for name, content in PageTemplate.objects.values_list('name', 'content').iterator():
+            for dependency in get_template_dependencies(content):
+                dependents.setdefault(dependency, set()).add(name)
+        _dependency_graph['dependents'] = dependents
+        _dependency_graph['signature'] = signature
+    return _dependency_graph['dependents']
+
+
+def get_dependent_template_names(template_name):
+    """Get the names of the given template and of all the templates that transitively extend or include it."""
+    dependents = get_template_dependents_graph()
+    names = {template_name}
+    to_visit = [template_name]
+    while to_visit:
+        for dependent in dependents.get(to_visit.pop(), ()):
+            if dependent not in names:
+                names.add(dependent)
+                to_visit.append(dependent)
+    return names
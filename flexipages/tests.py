@@ -0,0 +1,376 @@
+import datetime
+import re
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sites.models import Site
+from django.test import TestCase, RequestFactory, override_settings
+from django.utils import timezone
+
+from flexipages.cache import get_pages_cache, get_cache_generations
+from flexipages.constants import CONTENT_RENDERING_MODE, PAGE_CACHE_DURATIONS
+from flexipages.models import Page, PageItem, PageItemLayout, PageTemplate, Tag
+from flexipages.purge import get_purge_backend, get_surrogate_key
+from flexipages.routing import ROUTING_VERSION_CACHE_KEY
+from flexipages.search import InvertedIndexSearchBackend
+from flexipages.utils import get_default_base_template_for_page
+from flexipages.views import create_rendered_page, get_edition_context
+from flexipages.warming import rerender_pages
+
+# Queries run to render a loaded page (once routing tables and templates are loaded): the layouts of the page along with
+# their items, the tags of these items, and the next publishing transition of these items.
+PAGE_RENDERING_QUERY_COUNT = 3
+
+
+class FlexiPagesTestCase(TestCase):
+    """Base class of the tests of FlexiPages, each of them starting with an empty pages cache."""
+    def setUp(self):
+        get_pages_cache().clear()
+
+    @staticmethod
+    def reload_routing_tables():
+        """Rebuild routing tables as if changes were committed, which never happens within tests."""
+        get_pages_cache().delete(ROUTING_VERSION_CACHE_KEY)
+
+    def create_page(self, path, title=None, **kwargs):
+        """Create a page with the default base template (unless given), available on the current site."""
+        kwargs.setdefault('template', get_default_base_template_for_page(PageTemplate))
+        page = Page.objects.create(path=path, title=title or path, **kwargs)
+        page.sites.add(Site.objects.get_current())
+        self.reload_routing_tables()
+        return page
+
+    @staticmethod
+    def create_item(page, tags=(), priority=None, zone_name='', **kwargs):
+        """Create an item published today (unless given otherwise), shown on the given page."""
+        kwargs.setdefault('publishing_start_date', timezone.now().date())
+        item = PageItem.objects.create(**kwargs)
+        item.tags.add(*tags)
+        PageItemLayout.objects.create(page=page, item=item, priority=priority, zone_name=zone_name)
+        return item
+
+    @staticmethod
+    def get_page(page):
+        """Load the given page anew, as the page view does."""
+        return Page.objects.select_related('template').prefetch_related('tags').get(pk=page.pk)
+
+    @staticmethod
+    def render_page(page, **query):
+        """Render the given (loaded) page as an anonymous visitor would get it with the given query arguments."""
+        request = RequestFactory().get(page.path, query)
+        request.user = AnonymousUser()
+        return create_rendered_page(request, page, get_edition_context(request))
+
+
+class PageRenderingQueriesTest(FlexiPagesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = self.create_page('/queries/')
+        self.tag = Tag.objects.create(name='queries')
+
+    def add_items(self, count):
+        for i in range(count):
+            content_rendering_mode = CONTENT_RENDERING_MODE.django_template if i % 2 else CONTENT_RENDERING_MODE.markdown
+            self.create_item(self.page, tags=[self.tag], priority=i, zone_name='zone-%i' % (i % 3), content='Item %i' % i, content_rendering_mode=content_rendering_mode)
+
+    def test_query_count_does_not_depend_on_item_count(self):
+        self.add_items(3)
+        # Load routing tables, site registries and templates.
+        self.render_page(self.get_page(self.page))
+        page = self.get_page(self.page)
+        with self.assertNumQueries(PAGE_RENDERING_QUERY_COUNT):
+            response = self.render_page(page)
+        self.assertContains(response, 'Item 2')
+
+        self.add_items(20)
+        page = self.get_page(self.page)
+        with self.assertNumQueries(PAGE_RENDERING_QUERY_COUNT):
+            response = self.render_page(page)
+        self.assertContains(response, 'Item 19')
+
+
+class CachedPageServingTest(FlexiPagesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = self.create_page('/served/', 'Served', cache_timeout=PAGE_CACHE_DURATIONS.one_hour)
+
+    def test_cached_page_is_served_without_queries(self):
+        self.assertContains(self.client.get(self.page.path), 'Served')
+        # The site, the route and the page itself are resolved in memory and from the pages cache.
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(self.page.path), 'Served')
+
+    def test_registration_required_is_honored(self):
+        self.client.get(self.page.path)
+        # Only rebuild routing tables, so that the page stays cached.
+        Page.objects.filter(pk=self.page.pk).update(registration_required=True)
+        self.reload_routing_tables()
+        self.assertRedirects(self.client.get(self.page.path), '/accounts/login/?next=/served/', fetch_redirect_response=False)
+
+    @staticmethod
+    def get_max_age(response):
+        return int(re.search(r'\bmax-age=(\d+)', response['Cache-Control']).group(1))
+
+    def test_validated_pages_are_kept_by_browsers_for_the_page_timeout(self):
+        response = self.client.get(self.page.path)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertEqual(self.get_max_age(response), 3600)
+        # Pages served from the pages cache may only be kept for as long as they remain fresh there.
+        response = self.client.get(self.page.path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertAlmostEqual(self.get_max_age(response), 3600, delta=2)
+
+    def test_pages_without_client_side_caching_are_not_kept_by_browsers(self):
+        Page.objects.filter(pk=self.page.pk).update(enable_client_side_caching=False)
+        response = self.client.get(self.page.path)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertNotIn('max-age', response['Cache-Control'])
+        self.assertIn('no-store', response['Cache-Control'])
+
+    def test_pages_viewed_by_editors_are_not_shared_with_visitors(self):
+        editor = User.objects.create_superuser('editor', 'editor@example.com', 'editor')
+        self.client.force_login(editor)
+        self.assertContains(self.client.get(self.page.path), 'pageUpdateToken')
+        self.client.logout()
+        self.assertNotContains(self.client.get(self.page.path), 'pageUpdateToken')
+        # The page is now cached for visitors, but not served to editors.
+        self.client.force_login(editor)
+        self.assertContains(self.client.get(self.page.path), 'latest_page_update')
+
+
+@override_settings(FLEXIPAGES_FRAGMENTS_CACHE_TIMEOUT=60)
+class FragmentsCacheTest(FlexiPagesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = self.create_page('/fragments/', 'Fragments')
+        self.tag = Tag.objects.create(name='fragments')
+        for i in range(3):
+            self.create_item(self.page, tags=[self.tag] if i else [], priority=i, content='Item {{ item.item_index }}/{{ item.item_count }} of {{ item.page.title }}', content_rendering_mode=CONTENT_RENDERING_MODE.django_template)
+
+    def test_fragments_depend_on_the_context_of_template_items(self):
+        self.assertContains(self.render_page(self.get_page(self.page)), 'Item 3/3 of Fragments')
+        # Filtering by tag changes the position of items.
+        response = self.render_page(self.get_page(self.page), tag=self.tag.name)
+        self.assertContains(response, 'Item 2/2 of Fragments')
+        self.assertNotContains(response, 'Item 3/3')
+        # Renaming the page changes the page that items are rendered with.
+        self.page.title = 'Renamed'
+        self.page.save()
+        self.assertContains(self.render_page(self.get_page(self.page)), 'Item 3/3 of Renamed')
+
+
+class NavigationCacheTest(FlexiPagesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pages = dict((path, self.create_page(path, priority=1)) for path in ('/nav/', '/nav/a/', '/nav/b/', '/nav/a/child/', '/other/'))
+
+    def get_refreshed_paths(self, change):
+        with mock.patch('flexipages.models.refresh_cache_for_pages') as refresh_cache_for_pages:
+            change()
+        page_pks = set(page_pk for call in refresh_cache_for_pages.call_args_list for page_pk in call[0][0])
+        return set(path for path, page in self.pages.items() if page.pk in page_pks)
+
+    def test_renaming_a_page_refreshes_the_pages_showing_it(self):
+        page = self.pages['/nav/a/']
+        page.title = 'Renamed'
+        # The parent, the siblings and the children of the page show it in their menus.
+        self.assertEqual(self.get_refreshed_paths(page.save), {'/nav/', '/nav/a/', '/nav/b/', '/nav/a/child/'})
+
+    def test_moving_a_page_refreshes_the_pages_showing_it_before_and_after(self):
+        page = self.pages['/nav/b/']
+        page.path = '/other/b/'
+        self.assertEqual(self.get_refreshed_paths(page.save), {'/nav/', '/nav/a/', '/nav/b/', '/other/'})
+
+    def test_adding_a_page_to_a_site_refreshes_the_pages_showing_it(self):
+        page = Page.objects.create(path='/nav/c/', title='C', template=self.pages['/nav/'].template, priority=1)
+        self.assertEqual(self.get_refreshed_paths(lambda: page.sites.add(Site.objects.get_current())), {'/nav/', '/nav/a/', '/nav/b/'})
+
+
+class PageTemplateCacheTest(FlexiPagesTestCase):
+    def test_renaming_a_template_refreshes_the_pages_depending_on_its_previous_name(self):
+        base = PageTemplate.objects.create(name='flexipages/tests/base.html', content='{% block content %}{% endblock %}')
+        template = PageTemplate.objects.create(name='flexipages/tests/page.html', content='{% extends "flexipages/tests/base.html" %}')
+        page = self.create_page('/templates/', template=template)
+        base.name = 'flexipages/tests/renamed.html'
+        with mock.patch('flexipages.models.refresh_cache_for_pages') as refresh_cache_for_pages:
+            base.save()
+        refresh_cache_for_pages.assert_called_once_with([page.pk])
+
+
+class SearchTest(FlexiPagesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = self.create_page('/search-test/')
+        self.items = dict((title, self.create_item(self.page, title=title, content='<p>%s</p>' % title)) for title in ('Straße', 'Große Straße'))
+
+    def test_non_ascii_terms_are_found(self):
+        response = self.client.get('/search/', {'contents': 'Große'})
+        self.assertContains(response, 'item_%s' % self.items['Große Straße'].pk)
+        self.assertNotContains(response, 'item_%s"' % self.items['Straße'].pk)
+
+    def test_items_removed_from_pages_are_no_longer_found(self):
+        item = self.items['Straße']
+        self.assertContains(self.client.get('/search/', {'contents': 'Straße'}), 'item_%s"' % item.pk)
+        last_updated = self.page.last_updated
+        PageItemLayout.objects.get(page=self.page, item=item).delete()
+        self.assertNotContains(self.client.get('/search/', {'contents': 'Straße'}), 'item_%s"' % item.pk)
+        self.assertGreater(Page.objects.get(pk=self.page.pk).last_updated, last_updated)
+
+
+class PublishingTest(FlexiPagesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = self.create_page('/publishing/', cache_timeout=PAGE_CACHE_DURATIONS.one_week)
+        self.today = timezone.now().date()
+
+    def add_item(self, start_date, end_date=None):
+        return self.create_item(self.page, content=str(start_date), publishing_start_date=start_date, publishing_end_date=end_date)
+
+    def get_items(self):
+        return PageItem.objects.filter(pageitemlayout__page=self.page)
+
+    def get_day(self, days):
+        return self.today + datetime.timedelta(days=days)
+
+    def test_next_publishing_date_is_the_next_start_date(self):
+        self.add_item(self.get_day(-1))
+        self.add_item(self.get_day(5))
+        self.add_item(self.get_day(3))
+        self.assertEqual(self.get_items().get_next_publishing_date(), self.get_day(3))
+
+    def test_next_publishing_date_is_the_day_after_the_next_end_date(self):
+        self.add_item(self.get_day(-1), self.get_day(-1))
+        self.add_item(self.get_day(-1), self.today)
+        self.add_item(self.get_day(3))
+        self.assertEqual(self.get_items().get_next_publishing_date(), self.get_day(1))
+
+    def test_next_publishing_date_is_none_without_transition(self):
+        self.add_item(None)
+        self.add_item(self.get_day(-3), self.get_day(-2))
+        self.assertIsNone(self.get_items().get_next_publishing_date())
+
+    def test_page_timeout_is_capped_at_utc_midnight_of_the_next_publishing_date(self):
+        self.add_item(self.get_day(1))
+        transition = datetime.datetime.combine(self.get_day(1), datetime.time.min).replace(tzinfo=timezone.utc)
+        expected_timeout = (transition - timezone.now()).total_seconds()
+        self.assertAlmostEqual(self.page.get_page_timeout_until_publishing_in_seconds(), expected_timeout, delta=2)
+
+    def test_page_timeout_is_not_capped_without_transition(self):
+        self.add_item(self.get_day(-1))
+        self.assertEqual(self.page.get_page_timeout_until_publishing_in_seconds(), self.page.get_page_timeout_in_seconds())
+
+    def test_published_items_are_the_started_and_not_ended_ones(self):
+        published = {self.add_item(self.today), self.add_item(self.get_day(-3), self.today)}
+        for start_date, end_date in ((None, None), (self.get_day(1), None), (self.get_day(-3), self.get_day(-1))):
+            self.add_item(start_date, end_date)
+        self.assertEqual(set(self.get_items().get_published_items()), published)
+
+
+class CacheGenerationsTest(FlexiPagesTestCase):
+    def test_generations_started_concurrently_are_kept(self):
+        site_id = Site.objects.get_current().pk
+        generations = get_cache_generations(1, 1, site_id)
+        # Another request started the generations right after they were found missing.
+        with mock.patch.object(get_pages_cache(), 'get_many', return_value=dict()):
+            self.assertEqual(get_cache_generations(1, 1, site_id), generations)
+
+
+class PageRerenderingTest(FlexiPagesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pages = [self.create_page('/rerendering-%i/' % i) for i in range(2)]
+
+    def get_generations(self):
+        return [get_cache_generations(page.pk, page.template_id, Site.objects.get_current().pk) for page in self.pages]
+
+    def test_pages_failing_to_render_get_their_cache_invalidated(self):
+        generations = self.get_generations()
+        # Re-rendering closes its database connection, as it runs in a background thread.
+        with mock.patch('flexipages.warming.connection'), mock.patch('flexipages.warming.render_page_into_cache', side_effect=ValueError), \
+                self.assertLogs('flexipages.warming', 'ERROR') as logs:
+            rerender_pages([page.pk for page in self.pages])
+        self.assertEqual(len(logs.records), len(self.pages))
+        for previous_generations, current_generations in zip(generations, self.get_generations()):
+            self.assertNotEqual(previous_generations, current_generations)
+
+
+@override_settings(FLEXIPAGES_SHARED_CACHING=True, FLEXIPAGES_PURGE_BACKEND='flexipages.purge.LocalMemoryPurgeBackend')
+class SharedCachingTest(FlexiPagesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.page = self.create_page('/shared/')
+        self.tag = Tag.objects.create(name='shared')
+        self.item = self.create_item(self.page, tags=[self.tag], content='Shared item')
+        get_purge_backend().purged_keys.clear()
+
+    def test_public_pages_are_shared(self):
+        response = self.client.get(self.page.path)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('s-maxage', response['Cache-Control'])
+        self.assertIn(get_surrogate_key('item', self.item.pk), response['Surrogate-Key'].split())
+
+    def test_pages_without_client_side_caching_are_not_shared(self):
+        Page.objects.filter(pk=self.page.pk).update(enable_client_side_caching=False)
+        get_pages_cache().clear()
+        response = self.client.get(self.page.path)
+        self.assertNotIn('public', response['Cache-Control'])
+        self.assertNotIn('s-maxage', response['Cache-Control'])
+        self.assertFalse(response.has_header('Surrogate-Key'))
+
+    def get_purged_keys(self, change):
+        # Keys are purged once changes are committed.
+        with mock.patch('flexipages.purge.transaction.on_commit', side_effect=lambda callback: callback()):
+            change()
+        return set(get_purge_backend().purged_keys)
+
+    def test_saving_purges_the_keys_of_the_saved_object(self):
+        self.assertIn(get_surrogate_key('page', self.page.pk), self.get_purged_keys(self.page.save))
+        self.assertIn(get_surrogate_key('item', self.item.pk), self.get_purged_keys(self.item.save))
+        self.assertIn(get_surrogate_key('tag', self.tag.pk), self.get_purged_keys(self.tag.save))
+
+
+class InvertedIndexSearchTest(FlexiPagesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = InvertedIndexSearchBackend()
+        self.red_apple = PageItem.objects.create(title='Red apple', content='A red apple, picked in the orchard.')
+        self.green_apple = PageItem.objects.create(title='Green apple', content='A green apple and a red pear.')
+        self.pear = PageItem.objects.create(title='Pear', content='Pears and apples.')
+
+    def search(self, to_search):
+        return self.backend.search(to_search, PageItem.objects.filter(pk__in=[self.red_apple.pk, self.green_apple.pk, self.pear.pk]))
+
+    def test_items_must_match_all_terms(self):
+        self.assertEqual(self.search('red apple'), [self.red_apple.pk, self.green_apple.pk])
+        self.assertEqual(self.search('green red apple'), [self.green_apple.pk])
+        self.assertEqual(self.search('blue apple'), [])
+
+    def test_last_term_matches_by_prefix(self):
+        self.assertEqual(set(self.search('pea')), {self.green_apple.pk, self.pear.pk})
+        self.assertEqual(self.search('green pe'), [self.green_apple.pk])
+        # Other terms must match exactly.
+        self.assertEqual(self.search('gree apple'), [])
+
+    def test_prefix_matching_several_terms_of_an_item_counts_once(self):
+        # 'pear' and 'pears' both match the prefix in the same item, whose weights add up.
+        results = self.search('p')
+        self.assertEqual(results[0], self.pear.pk)
+        self.assertEqual(set(results), {self.red_apple.pk, self.green_apple.pk, self.pear.pk})
+        self.assertEqual(self.search('apples p'), [self.pear.pk])
+
+    def test_terms_of_titles_rank_first(self):
+        self.assertEqual(self.search('pear'), [self.pear.pk, self.green_apple.pk])
+
+    def test_index_is_updated_on_save(self):
+        self.pear.title = 'Quince'
+        self.pear.content = 'Quinces.'
+        self.pear.save()
+        self.assertEqual(self.search('pear'), [self.green_apple.pk])
+        self.assertEqual(self.search('quince'), [self.pear.pk])
+
+    def test_index_is_updated_on_bulk_update(self):
+        self.red_apple.content = 'A red cherry.'
+        self.green_apple.title = 'Green cherry'
+        PageItem.objects.bulk_update([self.red_apple, self.green_apple], ['title', 'content'])
+        self.assertEqual(set(self.search('cherr')), {self.red_apple.pk, self.green_apple.pk})
+        self.assertEqual(self.search('orchard'), [])
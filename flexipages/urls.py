@@ -1,17 +1,18 @@
-from django.contrib.sitemaps.views import sitemap
 from django.urls import path
 
 from flexipages import views
-from flexipages.constants import SEARCH_RESULTS_PATH
-from flexipages.sitemaps import FlexiPagesSitemap
+from flexipages.constants import SEARCH_RESULTS_PATH, AJAX_SEARCH_RESULTS_PATH
 
 app_name = "flexipages"
 
 urlpatterns = [
-    path('sitemap.xml', sitemap, {'sitemaps': {'flexipages': FlexiPagesSitemap}}, name='flexipages.sitemaps.'),
+    path('sitemap.xml', views.sitemap_index, name='flexipages.sitemaps.'),
+    path('sitemap-<slug:section>.xml', views.sitemap_section, name='flexipages.sitemaps.section'),
     path('add_page_item/<int:page_pk>/', views.add_page_item, name='add_page_item'),
     path('swap_content_<int:first_item_pk>_with_<int:second_item_pk>_on_page_<int:page_pk>/', views.swap_item_positions, name='swap_item_positions'),
     path(SEARCH_RESULTS_PATH, views.search_results, name='search_results'),
+    path(AJAX_SEARCH_RESULTS_PATH, views.ajax_search_results, name='ajax_search_results'),
+    path('ajax/check_page_update/', views.ajax_check_page_update, name='ajax_check_page_update'),
     path('ajax/get_last_page_update/', views.ajax_get_last_page_update, name='ajax_get_last_page_update'),
     path('<path:path>', views.flexipages_page),
     path('', views.flexipages_page, kwargs=dict(path='')),
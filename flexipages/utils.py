@@ -2,15 +2,20 @@ from os import path
 from os.path import dirname
 from typing import Mapping
 
-from django.apps import apps as django_apps
-from django.contrib.sites.shortcuts import get_current_site
+from django.conf import settings
+from django.core import signing
 from django.template import engines
 from django.template.defaultfilters import truncatewords
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 
+from flexipages.cache import get_pages_cache, get_user_groups_cache_key, delete_cache_for_user_groups
 from flexipages.constants import FLEXIPAGES_EDITOR_GROUP_NAME, FLEXIPAGES_ADMIN_GROUP_NAME, FLEXIPAGES_SITE_DESIGNER_GROUP_NAME, \
-    SEMANTIC_UI_CSS_URL, IS_EDITING_ATTRIBUTE_NAME
+    SEMANTIC_UI_CSS_URL, IS_EDITING_ATTRIBUTE_NAME, FLEXIPAGES_GROUP_NAMES, PAGE_UPDATE_TOKEN_SALT, \
+    PAGE_UPDATE_TOKEN_HEADER, MAX_PAGE_UPDATE_POLL_INTERVAL
+from flexipages.purge import get_surrogate_key, format_surrogate_keys, GLOBAL_SURROGATE_KEY
+from flexipages.sites import get_current_site, get_site_config
 
 
 def setup_default_templates(model, force_update):
@@ -43,14 +48,6 @@ def get_default_base_template_for_page(page_template_model):
         pass
 
 
-def get_site_config(site):
-    SiteConfiguration = django_apps.get_model('flexipages.SiteConfiguration')
-    try:
-        return SiteConfiguration.objects.get(site=site)
-    except SiteConfiguration.DoesNotExist:
-        pass
-
-
 def get_current_site_and_config(request):
     current_site = get_current_site(request)
     return current_site, get_site_config(current_site)
@@ -63,12 +60,45 @@ def get_base_url_for_page(page, request):
     return base_url
 
 
+def get_flexipages_group_names(user):
+    """
+    @:return the names of the FlexiPages groups that the given user belongs to. They are fetched with a single query,
+    then kept on the user for the ongoing request, and in the pages cache for a short while.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    group_names = getattr(user, '_flexipages_group_names', None)
+    if group_names is None:
+        pages_cache = get_pages_cache()
+        user_groups_cache_key = get_user_groups_cache_key(user.pk)
+        group_names = pages_cache.get(user_groups_cache_key)
+        if group_names is None:
+            group_names = frozenset(user.groups.filter(name__in=FLEXIPAGES_GROUP_NAMES).values_list('name', flat=True))
+            pages_cache.set(user_groups_cache_key, group_names, settings.FLEXIPAGES_USER_GROUPS_CACHE_TIMEOUT)
+        user._flexipages_group_names = group_names
+    return group_names
+
+
+def invalidate_user_groups_on_change(instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        user_pks = [instance.pk]
+    elif pk_set is not None:
+        user_pks = pk_set
+    else:
+        # All the users of the group are about to be removed from it.
+        user_pks = list(instance.user_set.values_list('pk', flat=True))
+    delete_cache_for_user_groups(user_pks)
+
+
 def get_permissions_for_user(user) -> Mapping[str, bool]:
     """Tells whether the currently authenticated user has permission to edit a page, its content and or its template."""
     if user.is_authenticated:
-        is_admin = user.groups.filter(name=FLEXIPAGES_EDITOR_GROUP_NAME).exists()
-        is_editor = user.groups.filter(name=FLEXIPAGES_EDITOR_GROUP_NAME).exists()
-        is_designer = user.groups.filter(name=FLEXIPAGES_SITE_DESIGNER_GROUP_NAME).exists()
+        group_names = get_flexipages_group_names(user)
+        is_admin = FLEXIPAGES_ADMIN_GROUP_NAME in group_names
+        is_editor = FLEXIPAGES_EDITOR_GROUP_NAME in group_names
+        is_designer = FLEXIPAGES_SITE_DESIGNER_GROUP_NAME in group_names
         return dict(
             can_edit_content=user.is_superuser or is_admin or is_designer or is_editor,
             can_edit_template=user.is_superuser or is_designer,
@@ -79,7 +109,20 @@ def get_permissions_for_user(user) -> Mapping[str, bool]:
             can_edit_template=False,
             can_edit_page=False
         )
-    return user.is_authenticated and (user.is_superuser or user.groups.filter(name__in=(FLEXIPAGES_EDITOR_GROUP_NAME, FLEXIPAGES_ADMIN_GROUP_NAME, FLEXIPAGES_SITE_DESIGNER_GROUP_NAME)).exists())
+
+
+def make_page_update_token(page_pk):
+    """Make the token that allows editors to check for updates of the given page, without any session lookup."""
+    return signing.dumps(page_pk, salt=PAGE_UPDATE_TOKEN_SALT)
+
+
+def get_page_pk_from_update_token(token, check_age=True):
+    """@:return the pk of the page that the given token was made for, or None if it is invalid (or expired)."""
+    max_age = settings.FLEXIPAGES_PAGE_UPDATE_TOKEN_MAX_AGE if check_age else None
+    try:
+        return signing.loads(token, salt=PAGE_UPDATE_TOKEN_SALT, max_age=max_age)
+    except signing.BadSignature:
+        return None
 
 
 def patch_response_for_inline_editing(request, page, edition_context: Mapping[str, bool], response_to_patch):
@@ -93,7 +136,8 @@ def patch_response_for_inline_editing(request, page, edition_context: Mapping[st
         # Patch header.
         rendered_content = rendered_content.replace('</head>', "%s</head>" % header_extra)
     page_edit_template = django_engine.get_template('flexipages/edition/page_toolbar.html')
-    context = dict(SEMANTIC_UI_CSS_URL=SEMANTIC_UI_CSS_URL, edition_context=edition_context, IS_EDITING_ATTRIBUTE_NAME=IS_EDITING_ATTRIBUTE_NAME, page=page)
+    context = dict(SEMANTIC_UI_CSS_URL=SEMANTIC_UI_CSS_URL, edition_context=edition_context, IS_EDITING_ATTRIBUTE_NAME=IS_EDITING_ATTRIBUTE_NAME, page=page, page_update_token=make_page_update_token(page.pk),
+                   PAGE_UPDATE_TOKEN_HEADER=PAGE_UPDATE_TOKEN_HEADER, page_update_poll_interval=min(settings.FLEXIPAGES_PAGE_UPDATE_POLL_INTERVAL, MAX_PAGE_UPDATE_POLL_INTERVAL))
     edition_toolbar = page_edit_template.render(request=request, context=context)
     # Insert page editing toolbar.
     rendered_content = rendered_content.replace('</body>', "%s</body>" % edition_toolbar)
@@ -101,6 +145,25 @@ def patch_response_for_inline_editing(request, page, edition_context: Mapping[st
     response_to_patch.content = mark_safe(rendered_content)
 
 
+def patch_response_for_shared_caching(request, page, context, response_to_patch):
+    """
+    Let reverse proxies and CDNs cache the response for as long as the page is cached on the server side, tagged with
+    surrogate keys so that it can be purged precisely. Pages are rendered per device, i.e. depending on the user agent.
+    """
+    surrogate_keys = [
+        GLOBAL_SURROGATE_KEY,
+        get_surrogate_key('site', get_current_site(request).pk),
+        get_surrogate_key('template', page.template_id),
+        get_surrogate_key('page', page.pk),
+    ]
+    surrogate_keys += [get_surrogate_key('item', item.pk) for item in context['all_items']]
+    surrogate_keys += [get_surrogate_key('tag', tag.pk) for tag in context['tags_related_to_page']]
+    for header in settings.FLEXIPAGES_SURROGATE_KEY_HEADERS:
+        response_to_patch[header] = format_surrogate_keys(header, surrogate_keys)
+    patch_cache_control(response_to_patch, public=True, s_maxage=page.get_page_timeout_until_publishing_in_seconds())
+    patch_vary_headers(response_to_patch, ['User-Agent'])
+
+
 def get_formatted_match(text: str, to_search: str):
     try:
         match_start = text.lower().index(to_search.lower())
@@ -108,9 +171,9 @@ def get_formatted_match(text: str, to_search: str):
         return None
     matched_length = len(to_search)
     context_length = 40
-    before = text[match_start - context_length:match_start]
+    before = text[max(match_start - context_length, 0):match_start]
     matched_text = text[match_start:match_start + matched_length]
     after = text[match_start + matched_length:match_start + matched_length + context_length]
-    after = (after[0] if after[0].isspace() else '') + truncatewords(after, context_length // 6)
+    after = (after[0] if after and after[0].isspace() else '') + truncatewords(after, context_length // 6)
     match = format_html('{}<span class="content-match">{}</span>{}', before, matched_text, after)
     return match
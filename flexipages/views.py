@@ -1,26 +1,39 @@
+import hashlib
+import json
 from typing import Mapping
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.http import Http404, JsonResponse, HttpResponseRedirect
+from django.contrib.sitemaps import views as sitemaps_views
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, HttpResponseRedirect, StreamingHttpResponse, HttpResponseForbidden, \
+    HttpResponseNotModified
 from django.shortcuts import get_object_or_404, redirect, render
-from django.template.defaultfilters import striptags
 from django.template.response import TemplateResponse
 from django.urls import reverse
-from django.utils.cache import patch_cache_control
+from django.utils.cache import patch_cache_control, get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag, parse_etags
 from django.utils.html import format_html
-from django.utils.translation import ugettext
+from django.utils.translation import ugettext, get_language
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.decorators.http import require_POST
 
-from flexipages.cache import get_pages_cache, get_page_cache_key
+from flexipages.cache import get_page_cache_key, get_device_for_request, get_cached_response, set_cached_response, \
+    acquire_page_rendering_lock, release_page_rendering_lock, is_page_rendering_locked, \
+    get_pages_cache, get_search_results_cache_key, get_page_version, get_sitemap_cache_key
 from flexipages.constants import IS_EDITING_ATTRIBUTE_NAME, PAGE_CACHE_DURATIONS, SEARCH_RESULTS_PATH, \
-    EDITION_CONTEXT_ATTRIBUTE_NAME
+    EDITION_CONTEXT_ATTRIBUTE_NAME, AJAX_SEARCH_RESULTS_PATH, PAGE_UPDATE_TOKEN_HEADER
 from flexipages.forms import SearchContentsForm
-from flexipages.models import Page, PageItem, PageItemLayout, Tag
+from flexipages.fragments import is_fragment_caching_enabled, attach_cached_fragments, cache_rendered_fragments
+from flexipages.models import Page, PageItem, PageItemLayout
+from flexipages.routing import get_routing_table, get_routing_version
+from flexipages.search import get_search_backend, normalize_searched_text, SearchResult
+from flexipages.sitemaps import sitemaps
+from flexipages.sites import get_current_site
 from flexipages.utils import get_current_site_and_config, get_base_url_for_page, get_permissions_for_user, \
-    patch_response_for_inline_editing, get_formatted_match
+    patch_response_for_inline_editing, patch_response_for_shared_caching, get_page_pk_from_update_token, \
+    make_page_update_token
 
 
 def flexipages_page(request, path):
@@ -29,7 +42,9 @@ def flexipages_page(request, path):
     """
     if not path.startswith('/'):
         path = '/' + path
-    site, site_config = get_current_site_and_config(request)
+    site = get_current_site(request)
+    routing_table = get_routing_table(site)
+    site_config = routing_table.site_config
     missing_prefix_in_request = False
     if site_config:
         if site_config.path_prefix:
@@ -37,14 +52,9 @@ def flexipages_page(request, path):
                 path = path[len(site_config.path_prefix):]
             else:
                 missing_prefix_in_request = True
-    try:
-        page = get_object_or_404(Page, path=path, sites=site.id)
-    except Http404:
-        if not path.endswith('/') and settings.APPEND_SLASH:
-            path += '/'
-            page = get_object_or_404(Page, path=path, sites=site.id)
-        else:
-            raise
+    route = routing_table.resolve(path)
+    if route is None:
+        raise Http404("No page matches the given path.")
 
     if missing_prefix_in_request:
         # Redirect to fully qualified path according to site settings when the page with given path exists, but we
@@ -52,7 +62,23 @@ def flexipages_page(request, path):
         # Page.get_absolute_url(). The page model has no knowledge of the site configuration since it may vary from
         # one request to another.
         # Since the prefix can be changed dynamically, we use a temporary redirect.
-        return HttpResponseRedirect(site_config.path_prefix + path)
+        return HttpResponseRedirect(site_config.path_prefix + route.path)
+
+    # Serve the page straight from the pages cache, without any database lookup, when possible.
+    if route.cache_timeout != PAGE_CACHE_DURATIONS.none and can_be_served_from_cache(request):
+        if route.registration_required and not request.user.is_authenticated:
+            from django.contrib.auth.views import redirect_to_login
+            return redirect_to_login(request.path)
+        page_cache_key = get_page_cache_key(request, route.page_pk, route.template_pk, routing_table.path_prefix)
+        cached_page, is_stale = get_cached_response(page_cache_key)
+        # A stale page is only served here while another request refreshes it.
+        if cached_page and (not is_stale or is_page_rendering_locked(page_cache_key)):
+            if cached_page.has_header('ETag'):
+                last_modified = parse_http_date_safe(cached_page['Last-Modified']) if cached_page.has_header('Last-Modified') else None
+                return get_conditional_response(request, etag=cached_page['ETag'], last_modified=last_modified, response=cached_page)
+            return cached_page
+
+    page = get_object_or_404(Page.objects.select_related('template').prefetch_related('tags'), pk=route.page_pk)
 
     # Attach site configuration to page to render.
     setattr(page, 'site_config', site_config)
@@ -60,6 +86,17 @@ def flexipages_page(request, path):
     return render_page(request, page)
 
 
+def can_be_served_from_cache(request):
+    """
+    Tells whether the requested page may be served from the pages cache before looking up the page, i.e. with the
+    very same response that any visitor would get. Pages customized via query arguments and pages viewed by editors are
+    never served this way.
+    """
+    if request.method not in ('GET', 'HEAD') or any(request.GET.values()):
+        return False
+    return not request.user.is_authenticated or not get_edition_context(request)['can_edit']
+
+
 @csrf_protect
 def render_page(request, page):
     """
@@ -71,10 +108,48 @@ def render_page(request, page):
         from django.contrib.auth.views import redirect_to_login
         return redirect_to_login(request.path)
 
-    response = get_or_create_rendered_page(request, page)
+    edition_context = get_edition_context(request)
+
+    # Answer conditional requests before any rendering when the browser already has the latest version of the page.
+    validators = get_page_validators(request, page, edition_context)
+    if validators:
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            set_page_validators(response, etag, last_modified, page.get_page_timeout_until_publishing_in_seconds())
+            return response
+
+    response = get_or_create_rendered_page(request, page, edition_context)
     return response
 
 
+def get_page_validators(request, page, edition_context: Mapping[str, bool]):
+    """
+    Get the validators of the page as rendered for the given request, i.e. its ETag and its last modification timestamp,
+    or None if the page must not be kept by browsers (client side caching disabled, or page viewed by an editor, whose
+    toolbar holds a token expiring after a while). The ETag also depends on the routing version, which changes along
+    with the navigation menus of pages.
+    """
+    if not page.enable_client_side_caching or edition_context['can_edit']:
+        return None
+    user_variant = 'authenticated' if request.user.is_authenticated else 'anonymous'
+    site_config = getattr(page, 'site_config', None)
+    last_modified = page.last_updated.timestamp()
+    variant = '%s|%s|%s|%s|%s|%s|%s' % (page.pk, last_modified, get_routing_version(), get_device_for_request(request), user_variant, get_language(), site_config.path_prefix if site_config else '')
+    return quote_etag(hashlib.md5(variant.encode('utf-8')).hexdigest()), int(last_modified)
+
+
+def set_page_validators(response, etag, last_modified, max_age):
+    """
+    Set the validators of the page on the given response, along with the duration for which browsers may keep the page
+    (the page cache timeout, capped at the next publishing transition of its items) before they must revalidate it,
+    instead of heuristically considering it as fresh for a while.
+    """
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, max_age=max_age)
+
+
 @require_POST
 def add_page_item(request, page_pk):
     page = get_object_or_404(Page, pk=page_pk)
@@ -138,35 +213,48 @@ def swap_item_positions(request, first_item_pk, second_item_pk, page_pk):
     return redirect(request.META['HTTP_REFERER'])
 
 
-def get_or_create_rendered_page(request, page):
-    edition_context = get_edition_context(request)
+def get_or_create_rendered_page(request, page, edition_context: Mapping[str, bool] = None):
+    if edition_context is None:
+        edition_context = get_edition_context(request)
 
-    # Do not cache page when edition is ongoing, when no cache is disabled or when the page is customized via special
-    # query arguments (filtering, etc.)
-    can_be_cached = not edition_context['is_editing'] and page.cache_timeout != PAGE_CACHE_DURATIONS.none and not any(request.GET.values())
+    # Do not cache page when viewed by an editor (it then holds the edition toolbar), when no cache is disabled or when
+    # the page is customized via special query arguments (filtering, etc.)
+    can_be_cached = not edition_context['can_edit'] and page.cache_timeout != PAGE_CACHE_DURATIONS.none and not any(request.GET.values())
 
     page_cache_key = None
-    pages_cache = None
+    has_rendering_lock = False
     if can_be_cached:
-        pages_cache = get_pages_cache()
-        page_cache_key = get_page_cache_key(request, page)
-        cached_page = pages_cache.get(page_cache_key)
-        if cached_page:
+        site_config = getattr(page, 'site_config', None)
+        page_cache_key = get_page_cache_key(request, page.pk, page.template_id, site_config.path_prefix if site_config else '')
+        cached_page, is_stale = get_cached_response(page_cache_key)
+        if cached_page and not is_stale:
             return cached_page
+        if page.cache_grace_period != PAGE_CACHE_DURATIONS.none:
+            # Refresh a stale page only once at a time: concurrent requests are served with the stale page meanwhile.
+            # Without any page to serve, they render it as well rather than keep workers waiting for it.
+            has_rendering_lock = acquire_page_rendering_lock(page_cache_key)
+            if not has_rendering_lock and cached_page:
+                return cached_page
 
-    response = create_rendered_page(request, page, edition_context)
+    try:
+        response = create_rendered_page(request, page, edition_context)
+        if page_cache_key:
+            cache_rendered_page(page, page_cache_key, response)
+    finally:
+        if has_rendering_lock:
+            release_page_rendering_lock(page_cache_key)
+    return response
 
-    # Update cache IFF necessary.
-    if page_cache_key:
-        if not page.enable_client_side_caching:
-            # The caching is done on the server only, not on the client-side. Otherwise we might end up showing
-            # obsolete data to the user despite the efforts to always return up to date pages on this app (the
-            # browser won't even bother asking the server!).
-            patch_cache_control(response, no_cache=True, no_store=True, must_revalidate=True)
-        # Cache rendered page for requested amount of time.
-        pages_cache.set(page_cache_key, response, page.get_page_timeout_in_seconds())
 
-    return response
+def cache_rendered_page(page, page_cache_key, response):
+    if not page.enable_client_side_caching:
+        # The caching is done on the server only, not on the client-side. Otherwise we might end up showing
+        # obsolete data to the user despite the efforts to always return up to date pages on this app (the
+        # browser won't even bother asking the server!).
+        patch_cache_control(response, no_cache=True, no_store=True, must_revalidate=True)
+    # Cache rendered page for requested amount of time, or until the publishing of any of its items changes (plus grace
+    # period during which it may be served while stale).
+    set_cached_response(page_cache_key, response, page.get_page_timeout_until_publishing_in_seconds(), page.get_page_grace_period_in_seconds())
 
 
 def get_edition_context(request):
@@ -181,35 +269,49 @@ def create_rendered_page(request, page, edition_context: Mapping[str, bool]):
     context = make_page_rendering_context(request, page, edition_context)
     response = TemplateResponse(request, template=page.template.name, context=context)
     response.render()
+    if is_fragment_caching_enabled(edition_context):
+        cache_rendered_fragments(page, context['items_by_zone'])
     if edition_context['is_editing'] or edition_context['can_edit']:
         patch_response_for_inline_editing(request, page, edition_context, response)
+    elif settings.FLEXIPAGES_SHARED_CACHING and can_be_shared(request, page):
+        patch_response_for_shared_caching(request, page, context, response)
+    validators = get_page_validators(request, page, edition_context)
+    if validators:
+        set_page_validators(response, *validators, max_age=page.get_page_timeout_until_publishing_in_seconds())
     return response
 
 
+def can_be_shared(request, page):
+    """
+    Tells whether the rendered page may be kept by reverse proxies and CDNs, i.e. a public page viewed anonymously,
+    which browsers may keep as well (no-store would otherwise contradict the shared caching).
+    """
+    return page.cache_timeout != PAGE_CACHE_DURATIONS.none and page.enable_client_side_caching and not page.registration_required and not request.user.is_authenticated
+
+
 def make_page_rendering_context(request, page, edition_context: Mapping[str, bool]):
     page.title = page.title
 
-    items = PageItem.objects.get_items_for_page(page, is_editing=edition_context['is_editing'])
+    # Fetch layouts, items and the tags of items at once, whatever the number of items.
+    layouts = list(PageItemLayout.objects.get_layouts_for_page(page, is_editing=edition_context['is_editing']))
+    tags_related_to_page = set()
+    for layout in layouts:
+        tags_related_to_page.update(layout.item.tags.all())
+    tags_related_to_page = sorted(tags_related_to_page, key=lambda tag: tag.name)
 
     # Handle item filtering based on query.
     tag_filter = request.GET.get('tag')
     if tag_filter:
-        items = items.filter(tags__name=tag_filter)
+        layouts = [layout for layout in layouts if any(tag.name == tag_filter for tag in layout.item.tags.all())]
 
     # Build page, layout and ordered item data.
-    layouts = PageItemLayout.objects.filter(page=page, item__in=items).select_related('item')
-    layout_by_item_dict = dict()
-    zones = set()
-    for layout in layouts:
-        layout_by_item_dict[layout.item_id] = layout
-        zones.add(layout.zone_name)
+    zones = set(layout.zone_name for layout in layouts)
     items_by_zone_dict = dict()
     all_items = []
     for layout in layouts:
         # Attach page and layout attributes to item for rendering.
         c = layout.item
         setattr(c, 'page', page)
-        layout = layout_by_item_dict[c.id]
         setattr(c, 'layout', layout)
         setattr(c, EDITION_CONTEXT_ATTRIBUTE_NAME, edition_context)
         items_by_zone_dict.setdefault(c.layout.zone_name or 'none', []).append(c)
@@ -225,8 +327,12 @@ def make_page_rendering_context(request, page, edition_context: Mapping[str, boo
                 setattr(c, 'item_count', zone_count)
                 setattr(c, 'item_index', i + 1)
         else:
-            setattr(c, 'item_count', 1)
-            setattr(c, 'item_index', 1)
+            setattr(items_for_zone[0], 'item_count', 1)
+            setattr(items_for_zone[0], 'item_index', 1)
+
+    # Reassemble the page from cached items and zones where possible (e.g. when filtering by tag or not caching pages).
+    if is_fragment_caching_enabled(edition_context):
+        attach_cached_fragments(page, items_by_zone_dict)
 
     any_gag_filter_label = ugettext("Any tag")
     context = dict(
@@ -235,10 +341,11 @@ def make_page_rendering_context(request, page, edition_context: Mapping[str, boo
         all_items=all_items,
         zones=zones,
         layouts=layouts,
-        tags_related_to_page=Tag.objects.get_tags_related_to_page(page=page, is_editing=edition_context['is_editing']),
+        tags_related_to_page=tags_related_to_page,
         tag_filter_reset_link=format_html('<a href="{}" class="{}">{}</a>', request.path, 'reset-tag-filter tag-filter-link', any_gag_filter_label) if tag_filter else any_gag_filter_label,
         active_tag_filter=tag_filter,
         base_url=get_base_url_for_page(page, request),
+        navigation=get_routing_table(get_current_site(request)).navigation.get_navigation_for_page(page.pk),
         search_form=SearchContentsForm(),
         search_url=reverse('flexipages:search_results'),
     )
@@ -248,41 +355,161 @@ def make_page_rendering_context(request, page, edition_context: Mapping[str, boo
 
 def search_results(request):
     search_results = []
+    search_results_page = None
     to_search = None
-    if request.method == 'POST':
-        search_form = SearchContentsForm(request.POST)
+    # Search forms are posted, whereas links to the other pages of results carry the searched text as query argument.
+    search_form = SearchContentsForm(request.POST if request.method == 'POST' else request.GET)
+    if request.method == 'POST' or 'contents' in request.GET:
         if search_form.is_valid():
-            to_search = search_form.cleaned_data['items']
+            to_search = search_form.cleaned_data['contents']
             if to_search:
-                items = PageItem.objects.get_published_items().filter(Q(content__icontains=to_search) | Q(title__icontains=to_search))
-                for item in items:
-                    pages = Page.objects.get_pages_for_request(request).filter(pageitemlayout__item=item)
-                    match = get_formatted_match(text=item.title, to_search=to_search)
-                    if not match:
-                        # Strip tags and search in plain text.
-                        text = striptags(item.content)
-                        match = get_formatted_match(text=text, to_search=to_search)
-                    if match:
-                        search_results.append(dict(item=item, pages=pages, match=match))
+                item_pks = search_items(request, to_search)
+                paginator = Paginator(item_pks, settings.FLEXIPAGES_SEARCH_RESULTS_PER_PAGE)
+                search_results_page = paginator.get_page(request.GET.get('page'))
+                # Only the results of the requested page are fetched and formatted.
+                search_results = get_search_results(request, search_results_page.object_list, to_search)
     else:
-        search_form = SearchContentsForm(request.GET)
+        search_form = SearchContentsForm()
     site, site_config = get_current_site_and_config(request)
-    base_url = request.path[:-len(SEARCH_RESULTS_PATH)].rstrip('/')
-    if base_url:
-        base_url = '%s/%s' % (base_url, site_config.path_prefix)
-    else:
-        base_url = site_config.path_prefix
     context = dict(
-        base_url=base_url,
+        base_url=get_search_base_url(request, site_config, SEARCH_RESULTS_PATH),
         search_form=search_form,
         search_url=request.path,
         search_results=search_results,
+        search_results_page=search_results_page,
+        has_more_results=search_results_page is not None and search_results_page.paginator.count >= settings.FLEXIPAGES_SEARCH_MAX_RESULTS,
         to_search=to_search,
     )
-    return render(request, template_name=site_config.search_results_template.name or 'flexipages/pages/search_results.html', context=context)
+    search_results_template = site_config.search_results_template.name if site_config else None
+    response = render(request, template_name=search_results_template or 'flexipages/pages/search_results.html', context=context)
+    if request.method == 'GET':
+        # Results of searches sent with GET may be kept by browsers (and by shared caches for anonymous visitors).
+        patch_cache_control(response, max_age=settings.FLEXIPAGES_SEARCH_RESULTS_MAX_AGE, **{'private' if request.user.is_authenticated else 'public': True})
+    return response
+
+
+def ajax_search_results(request):
+    """
+    Stream the best results for the text searched with the 'contents' query argument as JSON, e.g. for type-ahead
+    search boxes. At most 'limit' results are returned (the number of results per page by default).
+    """
+    to_search = request.GET.get('contents', '').strip()
+    try:
+        limit = int(request.GET.get('limit', settings.FLEXIPAGES_SEARCH_RESULTS_PER_PAGE))
+    except ValueError:
+        limit = settings.FLEXIPAGES_SEARCH_RESULTS_PER_PAGE
+    limit = max(limit, 1)
+    item_pks = search_items(request, to_search, limit=limit) if to_search else []
+    site, site_config = get_current_site_and_config(request)
+    base_url = get_search_base_url(request, site_config, AJAX_SEARCH_RESULTS_PATH)
+    return StreamingHttpResponse(stream_search_results(request, item_pks, to_search, base_url), content_type='application/json')
+
+
+def stream_search_results(request, item_pks, to_search, base_url):
+    yield '{"results": ['
+    chunk_size = settings.FLEXIPAGES_SEARCH_RESULTS_PER_PAGE
+    for start in range(0, len(item_pks), chunk_size):
+        for i, result in enumerate(get_search_results(request, item_pks[start:start + chunk_size], to_search)):
+            data = dict(
+                item=result.item.pk,
+                title=result.item.title,
+                match=result.match,
+                urls=['%s%s#item_%s' % (base_url, page.get_absolute_url(), result.item.pk) for page in result.pages],
+            )
+            yield '%s%s' % (',' if start or i else '', json.dumps(data, cls=DjangoJSONEncoder))
+    yield ']}'
+
+
+def search_items(request, to_search, limit=None):
+    """
+    @:return the pks of the published items shown on pages available to the request that match the searched text, the
+    best match first, and at most limit. Results are cached by normalized searched text.
+    """
+    normalized_search = normalize_searched_text(to_search)
+    scope = 'authenticated' if request.user.is_authenticated else 'anonymous'
+    search_results_cache_key = get_search_results_cache_key(get_current_site(request).pk, scope, normalized_search)
+    pages_cache = get_pages_cache()
+    item_pks = pages_cache.get(search_results_cache_key)
+    if item_pks is None:
+        layouts = PageItemLayout.objects.filter(page__in=Page.objects.get_pages_for_request(request))
+        items = PageItem.objects.get_published_items().filter(pk__in=layouts.values('item'))
+        item_pks = get_search_backend().search(normalized_search, items, limit=settings.FLEXIPAGES_SEARCH_MAX_RESULTS)
+        pages_cache.set(search_results_cache_key, item_pks, settings.FLEXIPAGES_SEARCH_CACHE_TIMEOUT)
+    return item_pks[:limit]
+
+
+def get_search_results(request, item_pks, to_search):
+    """Get the results for the given items along with the pages showing them (the ones available to the request only)."""
+    items = PageItem.objects.in_bulk(item_pks)
+    pages_by_item = dict()
+    for layout in PageItemLayout.objects.filter(item__in=item_pks, page__in=Page.objects.get_pages_for_request(request)).select_related('page'):
+        pages_by_item.setdefault(layout.item_id, []).append(layout.page)
+    return [SearchResult(items[item_pk], pages_by_item.get(item_pk, []), to_search) for item_pk in item_pks if item_pk in items]
+
+
+def get_search_base_url(request, site_config, view_path):
+    path_prefix = site_config.path_prefix if site_config else ''
+    base_url = request.path[:-len(view_path)].rstrip('/')
+    if base_url:
+        return '%s/%s' % (base_url, path_prefix)
+    return path_prefix
+
+
+def ajax_check_page_update(request):
+    """
+    Polled by editors to get notified of updates of a page: answers at once with the current version of the page, or
+    with status 304 when it is the one given by If-None-Match. The page is given by a signed token, so that neither the
+    session nor the database are queried. Expired tokens are renewed for users who can still edit pages (the new token
+    is sent in the PAGE_UPDATE_TOKEN_HEADER header).
+    """
+    token = request.GET.get('token', '')
+    new_token = None
+    page_pk = get_page_pk_from_update_token(token)
+    if page_pk is None:
+        page_pk = get_page_pk_from_update_token(token, check_age=False)
+        if page_pk is None or not get_edition_context(request)['can_edit']:
+            return HttpResponseForbidden()
+        new_token = make_page_update_token(page_pk)
+    version = get_page_version(page_pk)
+    if quote_etag(version) in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        response = JsonResponse(data=dict(version=version))
+    response['ETag'] = quote_etag(version)
+    if new_token:
+        response[PAGE_UPDATE_TOKEN_HEADER] = new_token
+    patch_cache_control(response, no_store=True)
+    return response
 
 
 @login_required
 def ajax_get_last_page_update(request):
     page = get_object_or_404(Page, pk=request.GET.get('page_pk'))
     return JsonResponse(data=dict(last_updated_timestamp=page.last_updated.timestamp()))
+
+
+def sitemap_index(request):
+    """The sitemap index of the current site, listing the pages of each sitemap section."""
+    return get_or_create_cached_sitemap(request, None, lambda: sitemaps_views.index(
+        request, sitemaps, sitemap_url_name='flexipages:flexipages.sitemaps.section'))
+
+
+def sitemap_section(request, section):
+    return get_or_create_cached_sitemap(request, section, lambda: sitemaps_views.sitemap(request, sitemaps, section=section))
+
+
+def get_or_create_cached_sitemap(request, section, create_sitemap):
+    """
+    Serve the given sitemap from the pages cache, or else generate it with the given function and cache it until pages
+    change (empty pages of sitemaps raise Http404, and are not cached).
+    """
+    timeout = settings.FLEXIPAGES_SITEMAP_CACHE_TIMEOUT
+    if not timeout:
+        return create_sitemap()
+    sitemap_cache_key = get_sitemap_cache_key(get_current_site(request).pk, request.scheme, section, request.GET.get('p', 1))
+    response = get_cached_response(sitemap_cache_key)[0]
+    if response is None:
+        response = create_sitemap()
+        response.render()
+        set_cached_response(sitemap_cache_key, response, timeout)
+    return response
@@ -0,0 +1,107 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django_user_agents.utils import get_user_agent
+
+from flexipages.cache import get_page_cache_key_for_device, delete_cache_for_pages, make_generation, \
+    set_page_generation, bump_page_versions, DEVICES
+from flexipages.purge import purge_surrogate_keys, get_surrogate_key
+from flexipages.sites import get_site_config
+
+# User agents used to render the device variants of pages.
+DEVICE_USER_AGENTS = dict(
+    desktop='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/86.0.4240.75 Safari/537.36',
+    mobile='Mozilla/5.0 (iPhone; CPU iPhone OS 14_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1',
+    tablet='Mozilla/5.0 (iPad; CPU OS 14_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Mobile/15E148 Safari/604.1',
+)
+
+_rendering_executor = None
+
+logger = logging.getLogger(__name__)
+
+
+def render_page_into_cache(page, site, device, page_generation=None):
+    """
+    Render the given page as an anonymous visitor of the given site would get it on the given device, and store it in
+    the pages cache (for the given page generation, or the current one).
+    """
+    from flexipages.views import create_rendered_page, cache_rendered_page, get_edition_context
+
+    site_config = get_site_config(site)
+    path_prefix = site_config.path_prefix if site_config else ''
+    request = RequestFactory().get(path_prefix + page.path, HTTP_HOST=site.domain, HTTP_USER_AGENT=DEVICE_USER_AGENTS[device])
+    request.user = AnonymousUser()
+    request.user_agent = get_user_agent(request)
+    setattr(page, 'site_config', site_config)
+    page_cache_key = get_page_cache_key_for_device(page.pk, page.template_id, site.pk, path_prefix, device, page_generation=page_generation)
+    response = create_rendered_page(request, page, get_edition_context(request))
+    cache_rendered_page(page, page_cache_key, response)
+
+
+def warm_page_cache(page_pk, site_pk, devices=DEVICES):
+    """
+    Render all the device variants of the given page for the given site into the pages cache. Suitable for running in
+    a thread or process pool.
+    @:return the path of the page.
+    """
+    Page = django_apps.get_model('flexipages.Page')
+    Site = django_apps.get_model('sites.Site')
+    try:
+        page = Page.objects.select_related('template').prefetch_related('tags').get(pk=page_pk)
+        site = Site.objects.get(pk=site_pk)
+        for device in devices:
+            render_page_into_cache(page, site, device)
+        return page.path
+    finally:
+        connection.close()
+
+
+def rerender_pages(page_pks):
+    """
+    Render the given pages anew for all their sites and device variants, then switch to the new cache entries at once
+    by making their generation current. Until then, the previous entries of each page keep being served. The cache of
+    pages that fail to render is invalidated instead.
+    """
+    Page = django_apps.get_model('flexipages.Page')
+    try:
+        for page in Page.objects.filter(pk__in=page_pks).select_related('template').prefetch_related('sites', 'tags'):
+            try:
+                page_generation = make_generation()
+                if page.get_page_timeout_in_seconds():
+                    for site in page.sites.all():
+                        for device in DEVICES:
+                            render_page_into_cache(page, site, device, page_generation=page_generation)
+            except Exception:
+                logger.exception("Cannot re-render page %s, its cache is invalidated instead.", page.pk)
+                delete_cache_for_pages([page.pk])
+                continue
+            set_page_generation(page.pk, page_generation)
+            purge_surrogate_keys([get_surrogate_key('page', page.pk)])
+    finally:
+        connection.close()
+
+
+def get_rendering_executor():
+    global _rendering_executor
+    if _rendering_executor is None:
+        _rendering_executor = ThreadPoolExecutor(max_workers=settings.FLEXIPAGES_RERENDER_WORKERS)
+    return _rendering_executor
+
+
+def refresh_cache_for_pages(page_pks):
+    """
+    Refresh the cache of the given pages after they changed: when re-rendering on save is enabled, the pages are queued
+    for re-rendering in the background once the ongoing transaction is committed; otherwise, their cache is invalidated.
+    In both cases, editors viewing these pages get notified.
+    """
+    bump_page_versions(page_pks)
+    if not settings.FLEXIPAGES_RERENDER_PAGES_ON_SAVE:
+        delete_cache_for_pages(page_pks)
+        return
+    page_pks = list(page_pks)
+    transaction.on_commit(lambda: get_rendering_executor().submit(rerender_pages, page_pks))